@@ -0,0 +1,149 @@
+"""
+Stage timings of the full pipeline on synthetic data, over a grid of
+asset counts, history years and sim counts:
+
+    python -m benchmarks.bench_pipeline --assets 3,10 --years 1,3 --sims 3000,30000
+    python -m benchmarks.bench_pipeline --save-baseline benchmarks/results/baseline.json
+    python -m benchmarks.bench_pipeline --baseline benchmarks/results/baseline.json --threshold 0.25
+
+Each grid point runs main's pipeline with profiling on, in a fresh process
+(so peak RSS is per point). Results go to a JSON file with one record per
+(point, stage, product): seconds (best of --repeat), throughput and peak RSS.
+With --baseline, exits 1 if any stage is slower than baseline * (1 + threshold)
+and by more than --min-seconds.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_dataset
+
+RESULTS_DIR = "benchmarks/results"
+
+def _ints(s):
+    return [int(x) for x in s.split(",")]
+
+def run_point(raw_dir, assets, sims, crn, plots, cache):
+    """Child process: point CFG at raw_dir, run the pipeline once, return stage rows + peak RSS."""
+    import main
+    from src import profiling
+    from src.config import CFG
+    work = tempfile.mkdtemp(prefix="bench-")
+    CFG.ASSETS, CFG.RAW_DIR = assets, raw_dir
+    CFG.PROC_DIR, CFG.OUT_RESULTS, CFG.OUT_FIGS = (os.path.join(work, d) + "/" for d in ("proc", "res", "figs"))
+    main.ASSETS = list(assets)
+    if cache:                                    # warm the columnar cache so "load" times the cached path
+        from src.data_loader import load_assets
+        load_assets(use_cache=True)
+    profiling.enable()
+    profiling.reset()
+    with profiling.stage("total"), open(os.devnull, "w") as null, redirect_stdout(null):
+        main._run(p_level=CFG.P_LEVEL, sims=sims, neg_rule=True, engine=None, workers=1, use_cache=cache,
+                  stream=False, crn=crn, waccs=None, tolerance=None, antithetic=None, stratify=None,
+                  plots=plots)
+    rows = profiling.report().replace({np.nan: None}).to_dict("records")
+    return rows, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _aggregate(rows, n_rows):
+    """Sum stage rows over assets -> {(stage, product): record} with throughput."""
+    out = {}
+    for r in rows:
+        key = (r["stage"], r["product"] or "ALL")
+        rec = out.setdefault(key, {"stage": key[0], "product": key[1], "seconds": 0.0, "sims_run": 0})
+        rec["seconds"] += r["seconds"]
+        rec["sims_run"] += int(r.get("sims") or 0)
+    for rec in out.values():
+        if rec["stage"] == "simulate" and rec["seconds"] > 0:
+            rec["sims_per_sec"] = rec["sims_run"] / rec["seconds"]
+        if rec["stage"] == "load" and rec["seconds"] > 0:
+            rec["rows_per_sec"] = n_rows / rec["seconds"]
+    return out
+
+def run_grid(assets_grid, years_grid, sims_grid, repeat=1, crn=True, plots=True, cache=False):
+    records = []
+    with tempfile.TemporaryDirectory(prefix="synth-") as root:
+        for n_assets in assets_grid:
+            for years in years_grid:
+                raw = os.path.join(root, f"a{n_assets}-y{years}") + "/"
+                assets = write_dataset(raw, n_assets, years)
+                n_rows = sum(sum(1 for _ in open(os.path.join(raw, f"{m['market'].lower()}_{a.lower()}.csv"))) - 1
+                             for a, m in assets.items())
+                for sims in sims_grid:
+                    best, rss = {}, 0
+                    for _ in range(repeat):
+                        with ProcessPoolExecutor(max_workers=1) as pool:
+                            rows, peak = pool.submit(run_point, raw, assets, sims, crn, plots, cache).result()
+                        rss = max(rss, peak)
+                        for key, rec in _aggregate(rows, n_rows).items():
+                            if key not in best or rec["seconds"] < best[key]["seconds"]:
+                                best[key] = rec
+                    point = {"assets": n_assets, "years": years, "sims": sims, "peak_rss_mb": rss / 2**20}
+                    records += [{**point, **rec} for rec in best.values()]
+                    total = best[("total", "ALL")]["seconds"]
+                    print(f"assets={n_assets:>3} years={years} sims={sims:>7}: {total:7.2f}s, "
+                          f"peak RSS {rss / 2**20:,.0f} MB")
+    return records
+
+def _key(r):
+    return (r["assets"], r["years"], r["sims"], r["stage"], r["product"])
+
+def compare(records, baseline, threshold, min_seconds):
+    """Rows that regressed past threshold vs the baseline records."""
+    base = {_key(r): r for r in baseline}
+    bad = []
+    for r in records:
+        b = base.get(_key(r))
+        if b is None: continue
+        if r["seconds"] > b["seconds"] * (1 + threshold) and r["seconds"] - b["seconds"] > min_seconds:
+            bad.append({**r, "baseline_s": b["seconds"], "ratio": r["seconds"] / max(b["seconds"], 1e-12)})
+    return bad
+
+def _meta():
+    return {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "numpy": np.__version__, "pandas": pd.__version__, "machine": platform.machine(),
+            "cpus": os.cpu_count()}
+
+def main(args):
+    records = run_grid(_ints(args.assets), _ints(args.years), _ints(args.sims), args.repeat,
+                       crn=not args.no_crn, plots=not args.no_plots, cache=args.cache)
+    out = args.out or os.path.join(RESULTS_DIR, f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    for path in filter(None, [out, args.save_baseline]):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"meta": _meta(), "records": records}, f, indent=2)
+        print(f"Wrote {path}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["records"]
+        bad = compare(records, baseline, args.threshold, args.min_seconds)
+        for r in bad:
+            print(f"REGRESSION {r['stage']}/{r['product']} assets={r['assets']} years={r['years']} "
+                  f"sims={r['sims']}: {r['seconds']:.3f}s vs {r['baseline_s']:.3f}s ({r['ratio']:.2f}x)")
+        if bad:
+            sys.exit(1)
+        print(f"No stage regressed more than {args.threshold:.0%} vs {args.baseline}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--assets", default="3", help="Comma-separated asset counts")
+    ap.add_argument("--years", default="3", help="Comma-separated years of hourly history")
+    ap.add_argument("--sims", default="3000", help="Comma-separated sim counts")
+    ap.add_argument("--repeat", type=int, default=1, help="Runs per point (best-of per stage)")
+    ap.add_argument("--no-crn", action="store_true", help="Independent per-product simulation (per-product timings)")
+    ap.add_argument("--no-plots", action="store_true", help="Skip figure rendering")
+    ap.add_argument("--cache", action="store_true", help="Time ingestion from a warm data/processed-style cache")
+    ap.add_argument("--out", default=None, help=f"Results JSON (default {RESULTS_DIR}/pipeline-<time>.json)")
+    ap.add_argument("--save-baseline", default=None, help="Also write the results to this baseline path")
+    ap.add_argument("--baseline", default=None, help="Fail (exit 1) on regressions vs this results file")
+    ap.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown per stage (0.25 = +25%%)")
+    ap.add_argument("--min-seconds", type=float, default=0.05, help="Ignore regressions smaller than this")
+    main(ap.parse_args())
@@ -0,0 +1,89 @@
+"""
+Synthetic hourly history and forward curves in the schema convert_to_csv.py
+writes (and data_loader reads), for scaling studies:
+
+    python -m benchmarks.synthetic --out /tmp/synth --assets 10 --years 3
+
+Prices are a seasonal/diurnal hub shape with lognormal scarcity spikes and
+occasional negative hours; busbar = hub + noisy basis; DA is a damped RT.
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+from src.config import CFG
+from src.registry import write_registry
+
+MARKETS = ("ERCOT", "MISO", "CAISO")
+
+def make_history(n_years: int, start_year: int = 2022, solar: bool = False, seed: int = 0):
+    """Hourly Date/HE/P/OP/Gen/RT_Busbar/RT_Hub/DA_Busbar/DA_Hub frame covering n_years."""
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range(f"{start_year}-01-01", f"{start_year + n_years}-01-01", freq="h", inclusive="left")
+    n = len(ts)
+    hour, dow, doy = ts.hour.to_numpy(), ts.dayofweek.to_numpy(), ts.dayofyear.to_numpy()
+    he = hour + 1
+    peak = np.isin(dow, CFG.PEAK_DAYS) & np.isin(he, CFG.PEAK_HOURS)
+
+    season = 1 + 0.25 * np.cos(2 * np.pi * (doy - 200) / 365)
+    diurnal = 1 + 0.3 * np.sin(np.pi * (hour - 6) / 16).clip(0)
+    spikes = np.where(rng.random(n) < 0.005, rng.lognormal(4.5, 1.0, n), 0.0)
+    rt_hub = 35 * season * diurnal + rng.normal(0, 8, n) + spikes
+    rt_hub = np.where(rng.random(n) < 0.01, -rng.exponential(15, n), rt_hub)
+    da_hub = 0.7 * rt_hub + 0.3 * 35 * season * diurnal + rng.normal(0, 3, n)
+    rt_basis = rng.normal(-3, 6, n) - 0.1 * spikes
+    da_basis = 0.6 * rt_basis + rng.normal(0, 2, n)
+
+    if solar:
+        gen = np.minimum(100 * np.sin(np.pi * (hour - 6) / 13).clip(0) * season * rng.uniform(0.5, 1.0, n), 100)
+    else:
+        # AR(1) wind index (phi=0.97) as a truncated exponential filter of white noise
+        ar = np.convolve(rng.normal(0, 0.15, n), 0.97 ** np.arange(200))[:n]
+        gen = 100 / (1 + np.exp(-(ar - 0.5)))
+    return pd.DataFrame({
+        "Date": ts.strftime("%Y-%m-%d"), "HE": he, "P/OP": np.where(peak, "P", "OP"),
+        "Gen": gen.round(1), "RT_Busbar": (rt_hub + rt_basis).round(3), "RT_Hub": rt_hub.round(3),
+        "DA_Busbar": (da_hub + da_basis).round(2), "DA_Hub": da_hub.round(2),
+    })
+
+def make_forwards(markets, seed: int = 0):
+    """Monthly hub Peak/Off_Peak forwards for every market over the forecast window."""
+    rng = np.random.default_rng(seed)
+    months = pd.date_range(f"{CFG.FORECAST_START_YEAR}-01-01", periods=12 * CFG.FORECAST_YEARS, freq="MS")
+    season = 1 + 0.2 * np.cos(2 * np.pi * (months.month.to_numpy() - 7) / 12)
+    rows = []
+    for mk in markets:
+        base = rng.uniform(40, 60)
+        rows.append(pd.DataFrame({"Market": mk, "Month": months.strftime("%Y-%m-%d"),
+                                  "Peak": (base * 1.15 * season).round(2), "Off_Peak": (base * season).round(2)}))
+    return pd.concat(rows, ignore_index=True)
+
+def write_dataset(out_dir: str, n_assets: int, n_years: int, markets=MARKETS, seed: int = 0):
+    """
+    Write n_assets history CSVs (round-robin over markets, every third solar)
+    plus forward_curves.csv and an assets.csv registry (for main.py --assets)
+    to out_dir. Returns the CFG.ASSETS-style dict.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    assets = {}
+    for i in range(n_assets):
+        name, mk = f"Synth{i:03d}", markets[i % len(markets)]
+        kind = "Solar" if i % 3 == 2 else "Wind"
+        assets[name] = {"market": mk, "type": kind, "history": f"{mk.lower()}_{name.lower()}.csv"}
+        df = make_history(n_years, solar=kind == "Solar", seed=seed + i)
+        df.to_csv(os.path.join(out_dir, assets[name]["history"]), index=False)
+    make_forwards(sorted(set(a["market"] for a in assets.values())), seed).to_csv(
+        os.path.join(out_dir, "forward_curves.csv"), index=False)
+    write_registry(assets, os.path.join(out_dir, "assets.csv"))
+    return assets
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", required=True, help="Output directory (used as RAW_DIR)")
+    ap.add_argument("--assets", type=int, default=3)
+    ap.add_argument("--years", type=int, default=3, help="Years of hourly history")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    assets = write_dataset(args.out, args.assets, args.years, seed=args.seed)
+    print(f"Wrote {len(assets)} assets x {args.years}y to {args.out}")
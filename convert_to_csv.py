@@ -1,8 +1,11 @@
 
 
 import os
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from pathlib import Path
+from openpyxl import load_workbook
 
 INPUT_XLSX = "data/raw/HackathonDataset.xlsx"
 OUT_DIR = Path("data/raw")
@@ -14,95 +17,135 @@ SHEET_TO_ASSET_CSV = {
     "CAISO": "caiso_howling_gale.csv",
 }
 
-def _money_to_float(x):
-    if pd.isna(x): return pd.NA
-    s = str(x).strip()
-    if s == "": return pd.NA
-    neg = s.startswith("(") and s.endswith(")")
-    s = s.replace("(", "").replace(")", "").replace("$", "").replace(",", "")
-    try:
-        v = float(s)
-        return -v if neg else v
-    except Exception:
-        return pd.NA
-
-def extract_sheet(sheet_name: str):
-    raw = pd.read_excel(INPUT_XLSX, sheet_name=sheet_name, header=None)
-
-    # --- Historical: detect header row with "Date" and "HE"
-    hist_header = None
-    for r in range(min(60, len(raw))):
-        vals = raw.iloc[r].astype(str).str.strip().tolist()
-        if "Date" in vals and ("HE" in vals or "Hour Ending" in vals):
-            hist_header = r
-            break
-    if hist_header is None:
-        raise ValueError(f"Historical header not found in {sheet_name}")
-
-    cols = raw.iloc[hist_header].astype(str).str.strip().tolist()
-    hist = raw.iloc[hist_header+1:].copy()
-    hist.columns = cols
-
-    # normalize names and keep A–H equivalents
-    rename = {
-        "RT Busbar":"RT_Busbar", "RT Hub":"RT_Hub",
-        "DA Busbar":"DA_Busbar", "DA Hub":"DA_Hub",
-        "Busbar":"RT_Busbar", "Hub":"RT_Hub"
-    }
-    hist = hist.rename(columns=rename)
-    keep = [c for c in ["Date","HE","P/OP","Gen","RT_Busbar","RT_Hub","DA_Busbar","DA_Hub"] if c in hist.columns]
-    hist = hist[keep].dropna(subset=["Date","HE"])
-
-    # type parsing
+HIST_SCAN_ROWS = 60        # historical header must sit in the first N rows
+FWD_SCAN_ROWS, FWD_SCAN_COLS = 80, 80
+CHUNK_ROWS = 50_000        # rows parsed/written per batch (bounds memory)
+HIST_COLS = ["Date","HE","P/OP","Gen","RT_Busbar","RT_Hub","DA_Busbar","DA_Hub"]
+MONEY_COLS = ["Gen","RT_Busbar","RT_Hub","DA_Busbar","DA_Hub"]
+
+def _money_to_float(s: pd.Series) -> pd.Series:
+    """Vectorized '$1,234.5' / '(12.00)' / numeric cells -> float64; blanks and junk -> NaN."""
+    num = pd.to_numeric(s, errors="coerce")
+    txt = s[num.isna() & s.notna()]
+    if len(txt):
+        t = txt.astype(str).str.strip()
+        neg = t.str.startswith("(") & t.str.endswith(")")
+        v = pd.to_numeric(t.str.replace(r"[()$,]", "", regex=True), errors="coerce")
+        num = num.astype("float64")
+        num.loc[txt.index] = v.where(~neg, -v)
+    return num.astype("float64")
+
+def _find_headers(head):
+    """Scan the first rows for the historical header row and the forward 'Peak'/'Off Peak' cells."""
+    hist_header = fwd_header = None
+    for r, row in enumerate(head):
+        vals = [str(v).strip() for v in row]
+        if hist_header is None and r < HIST_SCAN_ROWS:
+            if "Date" in vals and ("HE" in vals or "Hour Ending" in vals):
+                hist_header = (r, vals)
+        if fwd_header is None and r < FWD_SCAN_ROWS:
+            for c in range(min(FWD_SCAN_COLS, len(vals)) - 1):
+                if vals[c] == "Peak" and vals[c+1] in ("Off Peak","Off-Peak","Off_Peak"):
+                    fwd_header = (r, c)
+                    break
+        if hist_header and fwd_header: break
+    return hist_header, fwd_header
+
+def _parse_hist(rows, cols):
+    hist = pd.DataFrame.from_records(rows, columns=cols).dropna(subset=["Date","HE"])
     hist["Date"] = pd.to_datetime(hist["Date"])
     hist["HE"] = pd.to_numeric(hist["HE"], errors="coerce").astype("Int64")
-    for c in ["Gen","RT_Busbar","RT_Hub","DA_Busbar","DA_Hub"]:
+    for c in MONEY_COLS:
         if c in hist.columns:
-            hist[c] = hist[c].map(_money_to_float)
-
-    # --- Forwards: find "Peak" and "Off Peak" header cells (K–M block)
-    fwd_header = None
-    max_r, max_c = min(80, raw.shape[0]), min(80, raw.shape[1])
-    for r in range(max_r):
-        for c in range(max_c-1):
-            v1 = str(raw.iat[r, c]).strip()
-            v2 = str(raw.iat[r, c+1]).strip()
-            if v1 == "Peak" and v2 in ("Off Peak","Off-Peak","Off_Peak"):
-                fwd_header = (r, c)
-                break
-        if fwd_header: break
-    if fwd_header is None:
-        raise ValueError(f"Forward headers (Peak/Off Peak) not found in {sheet_name}")
-
-    r0, c0 = fwd_header
-    month_col, peak_col, off_col = c0-1, c0, c0+1
-    fwd = raw.iloc[r0+1:, [month_col, peak_col, off_col]].copy()
-    fwd.columns = ["Month","Peak","Off_Peak"]
+            hist[c] = _money_to_float(hist[c])
+    return hist
+
+def _parse_fwd(rows, sheet_name):
+    fwd = pd.DataFrame.from_records(rows, columns=["Month","Peak","Off_Peak"])
     fwd = fwd[fwd["Month"].notna()]
-    fwd["Month"] = pd.to_datetime(fwd["Month"], errors="coerce", infer_datetime_format=True)
+    fwd["Month"] = pd.to_datetime(fwd["Month"], errors="coerce")
     fwd = fwd[fwd["Month"].notna()].copy()
     for c in ["Peak","Off_Peak"]:
-        fwd[c] = fwd[c].map(_money_to_float)
+        fwd[c] = _money_to_float(fwd[c])
     fwd["Market"] = sheet_name.upper()
-    fwd = fwd[["Market","Month","Peak","Off_Peak"]].reset_index(drop=True)
-    return hist.reset_index(drop=True), fwd
-
-def main():
+    return fwd[["Market","Month","Peak","Off_Peak"]].reset_index(drop=True)
+
+def extract_sheet(sheet_name: str, out_csv):
+    """
+    Stream one sheet: historical rows go to `out_csv` in CHUNK_ROWS batches,
+    the (small) forward block is returned. Only rows with a Month cell are kept
+    for it, so memory stays bounded by that block, not the sheet length.
+    Returns (hist_rows_written, fwd).
+    """
+    wb = load_workbook(INPUT_XLSX, read_only=True, data_only=True)
+    try:
+        rows = wb[sheet_name].iter_rows(values_only=True)
+        head = list(itertools.islice(rows, max(HIST_SCAN_ROWS, FWD_SCAN_ROWS)))
+        hist_header, fwd_header = _find_headers(head)
+        if hist_header is None:
+            raise ValueError(f"Historical header not found in {sheet_name}")
+        if fwd_header is None:
+            raise ValueError(f"Forward headers (Peak/Off Peak) not found in {sheet_name}")
+
+        # normalize names and keep A–H equivalents (first occurrence of each)
+        rename = {
+            "RT Busbar":"RT_Busbar", "RT Hub":"RT_Hub",
+            "DA Busbar":"DA_Busbar", "DA Hub":"DA_Hub",
+            "Busbar":"RT_Busbar", "Hub":"RT_Hub", "Hour Ending":"HE",
+        }
+        h0, names = hist_header
+        pos = {}
+        for i, n in enumerate(names):
+            pos.setdefault(rename.get(n, n), i)
+        keep = [c for c in HIST_COLS if c in pos]
+        idx = [pos[c] for c in keep]
+        r0, c0 = fwd_header
+        fidx = [c0-1, c0, c0+1]
+        pick = lambda row, ix: tuple(row[i] if i < len(row) else None for i in ix)
+
+        buf, fwd_rows, written = [], [], 0
+        header = True
+        for r, row in enumerate(itertools.chain(head, rows)):
+            if r > h0: buf.append(pick(row, idx))
+            if r > r0 and pick(row, fidx[:1])[0] not in (None, ""):   # Month set: still in the forward block
+                fwd_rows.append(pick(row, fidx))
+            if len(buf) >= CHUNK_ROWS:
+                written += _write_chunk(_parse_hist(buf, keep), out_csv, header)
+                header, buf = False, []
+        if buf or header:
+            written += _write_chunk(_parse_hist(buf, keep), out_csv, header)
+    finally:
+        wb.close()
+    return written, _parse_fwd(fwd_rows, sheet_name)
+
+def _write_chunk(df, out_csv, header):
+    df.to_csv(out_csv, index=False, mode="w" if header else "a", header=header)
+    return len(df)
+
+def main(workers: int = None):
     if not os.path.exists(INPUT_XLSX):
         raise FileNotFoundError(f"Missing {INPUT_XLSX}")
 
-    xls = pd.ExcelFile(INPUT_XLSX)
-    print("Sheets found:", xls.sheet_names)
+    wb = load_workbook(INPUT_XLSX, read_only=True)
+    sheet_names = wb.sheetnames
+    wb.close()
+    print("Sheets found:", sheet_names)
 
-    fw_all = []
+    todo = {}
     for sheet, outname in SHEET_TO_ASSET_CSV.items():
-        if sheet not in xls.sheet_names:
+        if sheet not in sheet_names:
             print(f"⚠️ Missing sheet {sheet}; skipping")
             continue
-        hist, fwd = extract_sheet(sheet)
-        hist.to_csv(OUT_DIR / outname, index=False)
-        print(f"✅ Wrote {OUT_DIR/outname} ({len(hist):,} rows)")
-        fw_all.append(fwd)
+        todo[sheet] = OUT_DIR / outname
+
+    fw_all = []
+    workers = workers or min(len(todo), os.cpu_count() or 1) or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {sheet: pool.submit(extract_sheet, sheet, out) for sheet, out in todo.items()}
+        for sheet, fut in futures.items():
+            n, fwd = fut.result()
+            print(f"✅ Wrote {todo[sheet]} ({n:,} rows)")
+            fw_all.append(fwd)
 
     if fw_all:
         fwd_all = pd.concat(fw_all, ignore_index=True)
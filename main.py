@@ -1,66 +1,199 @@
 import argparse
+import cProfile
+import pstats
 import os
-import numpy as np
+import shutil
 import pandas as pd
 
 from src.config import CFG
 from src.utils import ensure_dirs
-from src.data_loader import load_assets, load_forwards
-from src.analysis import build_hist_buckets
-from src.forecasting import forecast_generation, forecast_hub_forwards
-from src.monte_carlo import simulate_merchant_price_per_mwh
-from src.valuation import p_level_price, compute_components, summarize_npvs
-from src.visualization import plot_distribution
-
-ASSETS   = list(CFG.ASSETS.keys())
+from src import profiling
+from src.data_loader import load_assets, load_forwards, source_keys
+from src.features import build_features
+from src.forecasting import forecast_hub_forwards, build_term_sheet
+from src.parallel import make_tasks, run_tasks, map_tasks, attach_stats
+from src.memo import StageCache, stage_key, config_parts
+from src.sweep import load_spec, run_sweep
+from src.registry import use_registry
+from src.portfolio import make_portfolio_tasks, run_portfolio_task, summarize_portfolio
+from src.service import serve
+from src.runstore import RunStore, TABLES
+from src.hourly import hourly_dirs
+from src.valuation import compute_components, summarize_npvs, npv_distribution
+from src.visualization import figure_spec, render_figures, save_figure_specs, load_figure_specs
+
+ASSETS   = use_registry()
 PRODUCTS = list(CFG.PRODUCTS)
 
-def main(p_level: int, sims: int, neg_rule: bool):
-    ensure_dirs(CFG.PROC_DIR, CFG.OUT_RESULTS, CFG.OUT_FIGS)
+def main(p_level: int, sims: int, neg_rule: bool, engine: str = None, workers: int = 1,
+         use_cache: bool = True, stream: bool = False, crn: bool = True, waccs=None,
+         tolerance: float = None, antithetic: bool = None, stratify: bool = None,
+         profile: bool = False, cprofile: bool = False, memo: bool = None, force: bool = False,
+         plots: bool = None, record: bool = None, label: str = None):
+    """
+    profile: write stage timings to profile.{csv,json}; cprofile: also dump cProfile stats.
+    memo: reuse cached stage results (default CFG.USE_MEMO); force: wipe every cache under PROC_DIR first.
+    plots: render figures (default CFG.PLOTS); histograms are saved either way for --plots-only.
+    record: append the run to the RUNS_DIR history (default CFG.RECORD_RUNS), tagged with `label`.
+    """
+    if force:
+        shutil.rmtree(CFG.PROC_DIR, ignore_errors=True)
+    kw = dict(p_level=p_level, sims=sims, neg_rule=neg_rule, engine=engine, workers=workers,
+              use_cache=use_cache, stream=stream, crn=crn, waccs=waccs,
+              tolerance=tolerance, antithetic=antithetic, stratify=stratify,
+              memo=CFG.USE_MEMO if memo is None else memo, plots=CFG.PLOTS if plots is None else plots,
+              record=CFG.RECORD_RUNS if record is None else record, label=label)
+    if not (profile or cprofile):
+        return _run(**kw)
+    profiling.enable()
+    profiling.reset()
+    prof = cProfile.Profile() if cprofile else None
+    try:
+        with profiling.stage("total"):
+            if prof: prof.runcall(_run, **kw)
+            else: _run(**kw)
+    finally:
+        profiling.enable(False)
+    if prof:
+        stats_path = os.path.join(CFG.OUT_RESULTS, "profile.pstats")
+        prof.dump_stats(stats_path)
+        pstats.Stats(prof).sort_stats("cumulative").print_stats(15)
+        print(f"Wrote: {stats_path}")
+    for path in profiling.write_report(CFG.OUT_RESULTS):
+        print(f"Wrote: {path}")
+
+def _prepare(use_cache: bool, memo: bool):
+    """
+    load -> features -> buckets, gen_forecast -> term_sheet stages (memoized; features runs once for
+    every asset whose buckets or gen_forecast missed).
+    Returns (cache, stores, gen_fcs, terms, term_keys).
+    """
+    cache = StageCache(enabled=memo)
 
-    assets = load_assets()
-    forwards = load_forwards()
+    data = {}
+    def frames():                                 # load stage, run only if some stage misses
+        if not data:
+            data["assets"] = load_assets(use_cache=use_cache)
+            data["forwards"] = load_forwards(use_cache=use_cache)
+        return data["assets"], data["forwards"]
+    src_keys = source_keys()                      # also with memo off: recorded runs dedupe sim/term files on them
 
-    price_rows, npv_rows, gen_fc_all = [], [], []
+    k_b = {a: stage_key("buckets", src_keys.get(a), config_parts("ROLLING_STD_HOURS")) for a in ASSETS}
+    k_g = {a: stage_key("gen_forecast", src_keys.get(a), config_parts("FORECAST_START_YEAR", "FORECAST_YEARS"))
+           for a in ASSETS}
+    feats = {}
+    def features(asset):                          # features stage: one stacked pass over every asset that misses
+        if asset not in feats:
+            todo = [a for a in ASSETS if a == asset or a not in feats and not
+                    (cache.has("buckets", k_b[a]) and cache.has("gen_forecast", k_g[a]))]
+            with profiling.stage("features"):
+                feats.update(build_features({a: frames()[0][a] for a in todo},
+                                            os.path.join(CFG.PROC_DIR, "features") if use_cache and memo else None))
+        return feats[asset]
 
+    # per-asset inputs, built once and shared with the simulation workers
+    stores, gen_fcs, terms, term_keys = {}, {}, {}, {}
     for asset in ASSETS:
         market = CFG.ASSETS[asset]["market"]
-        df = assets[asset]
+        k_t = term_keys[asset] = stage_key("term_sheet", k_b[asset], k_g[asset], src_keys.get("forwards"),
+                                           asset, market)
+        with profiling.stage("buckets", asset):
+            stores[asset] = cache.get("buckets", k_b[asset], lambda: features(asset)[0])
+        with profiling.stage("gen_forecast", asset):
+            gen_fcs[asset] = cache.get("gen_forecast", k_g[asset], lambda: features(asset)[1].forecast())
+        with profiling.stage("term_sheet", asset):
+            terms[asset] = cache.get("term_sheet", k_t, lambda: build_term_sheet(
+                gen_fcs[asset], forecast_hub_forwards(frames()[1], market), stores[asset]))
+        if terms[asset].missing_fw:
+            months = ", ".join(f"{y}-{m:02d}" for y, m in terms[asset].missing_fw)
+            print(f"⚠️ {asset}: no hub forward for {months}; priced at 0.0")
+    return cache, stores, gen_fcs, terms, term_keys
 
-        buckets, p_high = build_hist_buckets(df)
-        gen_fc = forecast_generation(df)
-        fw_mkt = forecast_hub_forwards(forwards, market)
+def run_sweep_cli(spec_path: str, use_cache: bool = True, memo: bool = None):
+    """--sweep: evaluate a scenario grid on shared draws and write sweep_results.csv."""
+    ensure_dirs(CFG.PROC_DIR, CFG.OUT_RESULTS)
+    spec = load_spec(spec_path)
+    _, stores, _, terms, _ = _prepare(use_cache, CFG.USE_MEMO if memo is None else memo)
+    print(f"Sweep: {spec.n_points} points per asset x {len(ASSETS)} assets, {spec.sims} sims each")
+    with profiling.stage("sweep"):
+        out = run_sweep(spec, stores, terms, ASSETS)
+    path = os.path.join(CFG.OUT_RESULTS, "sweep_results.csv")
+    out.round(4).to_csv(path, index=False)
+    print(f"Wrote: {path} ({len(out):,} rows)")
+    return out
 
-        # basis means for component breakdown
-        hist_basis_means = {}
-        for (month, period), b in buckets.items():
-            hist_basis_means[((month, period), "RT")] = float(b["rt_basis"].mean()) if len(b["rt_basis"])>0 else 0.0
-            hist_basis_means[((month, period), "DA")] = float(b["da_basis"].mean()) if len(b["da_basis"])>0 else 0.0
+def run_portfolio_cli(p_level: int, sims: int, neg_rule: bool, workers: int = 1, use_cache: bool = True,
+                      memo: bool = None):
+    """--portfolio: joint simulation of every asset on shared market hub draws; writes portfolio_*.csv."""
+    ensure_dirs(CFG.PROC_DIR, CFG.OUT_RESULTS)
+    _, stores, _, terms, _ = _prepare(use_cache, CFG.USE_MEMO if memo is None else memo)
+    tasks = make_portfolio_tasks(ASSETS, PRODUCTS, neg_rule, sims, CFG.RANDOM_SEED)
+    print(f"Portfolio: {len(ASSETS)} assets in {len({t.market for t in tasks})} markets, "
+          f"{len(tasks)} tasks, {sims:,} sims")
+    with profiling.stage("portfolio"):
+        results = {}
+        for part in map_tasks(run_portfolio_task, tasks, stores, terms, workers):
+            results.update(part)
+        summary, contrib = summarize_portfolio(results, ASSETS, p_level)
+    for name, df in (("portfolio_summary", summary), ("portfolio_contributions", contrib)):
+        path = os.path.join(CFG.OUT_RESULTS, f"{name}.csv")
+        df.round(4).to_csv(path, index=False)
+        print(f"Wrote: {path}")
+    return summary, contrib
+
+def _run(p_level: int, sims: int, neg_rule: bool, engine: str, workers: int, use_cache: bool,
+         stream: bool, crn: bool, waccs, tolerance: float, antithetic: bool, stratify: bool, memo: bool = False,
+         plots: bool = True, record: bool = False, label: str = None):
+    """
+    Stage graph: load -> buckets -> gen_forecast -> term_sheet (forwards) -> simulate
+    -> components -> NPV -> outputs -> record -> plot. Stages up to simulate are memoized under a
+    hash of their upstream keys and the Config fields they read, so a rerun that
+    changes only P-level or WACC_ANNUAL reloads the cached sims and recomputes
+    the cheap downstream stages; raw data is not even loaded.
+    """
+    waccs = tuple(waccs or CFG.NPV_WACCS)
+    engine = engine or CFG.SIM_ENGINE
+    tolerance = CFG.SIM_TOLERANCE if tolerance is None else tolerance
+    ensure_dirs(CFG.PROC_DIR, CFG.OUT_RESULTS, CFG.OUT_FIGS)
+    cache, stores, gen_fcs, terms, term_keys = _prepare(use_cache, memo)
+
+    # fan out simulations: per asset (shared draws) or per (asset, product, negative_rule)
+    sim_cfg = config_parts("RANDOM_SEED", "BASIS_STRESS_ALPHA", "SIM_BLOCK_SIZE", "SIM_ANTITHETIC",
+                           "SIM_STRATIFY", "STREAM_SHARD_SIMS", "SKETCH_ALPHA")
+    if engine == "hourly":
+        sim_cfg.update(config_parts("HOURLY_BLOCK_DAYS", "HOURLY_WINDOW_DAYS", "HOURLY_BLOCK_SIMS",
+                                    "HOURLY_SHARD_SIMS", "PEAK_HOURS", "PEAK_DAYS"))
+    adaptive = dict(p_level=p_level, batch=CFG.SIM_BATCH, ci=CFG.CI_LEVEL) if tolerance else None
+    k_sim = stage_key("simulate", [(a, CFG.ASSETS[a]["market"], term_keys[a]) for a in ASSETS], PRODUCTS,
+                      neg_rule, sims, engine, stream, crn, waccs, tolerance, adaptive, antithetic, stratify, sim_cfg)
+    def simulate():
+        tasks = make_tasks(ASSETS, PRODUCTS, neg_rule, sims, p_level, engine, CFG.RANDOM_SEED,
+                           stream=stream, crn=crn, waccs=waccs,
+                           tolerance=tolerance, antithetic=antithetic, stratify=stratify)
+        hourly = hourly_dirs(assets=ASSETS, use_cache=use_cache) if engine == "hourly" else None
+        return run_tasks(tasks, stores, terms, workers=workers, hourly=hourly)
+    results = attach_stats(cache.get("simulate", k_sim, simulate), p_level)
+    if cache.hits:
+        print(f"♻️ Reused cached stages: {', '.join(sorted(set(cache.hits)))}")
+
+    price_rows, npv_rows, dist_rows, gen_fc_all, fig_specs = [], [], [], [], []
+
+    for asset in ASSETS:
+        market = CFG.ASSETS[asset]["market"]
+        gen_fc, term = gen_fcs[asset], terms[asset]
 
         sim_p50_prices = {}
 
         for product in PRODUCTS:
-            sims_prices = simulate_merchant_price_per_mwh(
-                buckets=buckets, gen_forecast=gen_fc, fw=fw_mkt,
-                product=product, p_high=p_high,
-                negative_rule=False, seed=CFG.REAL_RANDOM_SEED if hasattr(CFG, "REAL_RANDOM_SEED") else CFG.RANDOM_SEED,
-                n_sims=sims
-            )
-            p75_price = p_level_price(sims_prices, p_level=p_level)
-
-            neg_p75_price = None
-            if neg_rule:
-                sims_prices_neg = simulate_merchant_price_per_mwh(
-                    buckets=buckets, gen_forecast=gen_fc, fw=fw_mkt,
-                    product=product, p_high=p_high,
-                    negative_rule=True, seed=CFG.RANDOM_SEED, n_sims=sims
-                )
-                neg_p75_price = p_level_price(sims_prices_neg, p_level=p_level)
+            sims_prices, stats, _ = results[(asset, product, False)]
+            p75_price = stats["p_price"]
+            neg_p75_price = results[(asset, product, True)][1]["p_price"] if neg_rule else None
 
-            hub_comp, basis_comp, risk_adj, neg_adj, p75_out = compute_components(
-                asset=asset, product=product, gen_fc=gen_fc, fw=fw_mkt,
-                hist_basis_means=hist_basis_means, p75_price=p75_price, neg_p75_price=neg_p75_price
-            )
+            with profiling.stage("components", asset, product):
+                hub_comp, basis_comp, risk_adj, neg_adj, p75_out = compute_components(
+                    asset=asset, product=product, term=term,
+                    p75_price=p75_price, neg_p75_price=neg_p75_price
+                )
 
             price_rows.append({
                 "asset": asset, "market": market, "product": product,
@@ -68,21 +201,26 @@ def main(p_level: int, sims: int, neg_rule: bool):
                 "basis_component": round(basis_comp, 2),
                 "risk_adj": round(risk_adj, 2),
                 "neg_adj": round(neg_adj, 2),
-                "p75_price": round(p75_out, 2)
+                "p75_price": round(p75_out, 2),
+                "n_sims": stats["n_sims"],
+                "p_ci_low": round(stats["ci_low"], 2),
+                "p_ci_high": round(stats["ci_high"], 2)
             })
 
-            plot_distribution(
-                sim_prices=sims_prices, p75=p75_price,
-                out_path=os.path.join(CFG.OUT_FIGS, f"{asset}_{product}_dist.png"),
-                title=f"{asset} {product} Distribution (P75={p75_price:.2f})"
-            )
+            with profiling.stage("histogram", asset, product):
+                fig_specs.append(figure_spec(
+                    sim_prices=sims_prices, p75=p75_price,
+                    out_path=os.path.join(CFG.OUT_FIGS, f"{asset}_{product}_dist.png"),
+                    title=f"{asset} {product} Distribution (P75={p75_price:.2f})"
+                ))
 
-            sim_p50_prices[product] = float(np.percentile(sims_prices, 50))
+            sim_p50_prices[product] = stats["p50"]
 
         # DCF (primary compare RT_BUS merchant P50 vs fixed P75)
         m_p50 = sim_p50_prices.get("RT_BUS", 0.0)
         f_p75 = [r for r in price_rows if r["asset"]==asset and r["product"]=="RT_BUS"][-1]["p75_price"]
-        m_npv, f_npv, delta = summarize_npvs(m_p50, f_p75, gen_fc)
+        with profiling.stage("dcf", asset):
+            m_npv, f_npv, delta = summarize_npvs(m_p50, f_p75, term)
         npv_rows.append({
             "asset": asset, "market": market,
             "merchant_p50_price": round(m_p50,2),
@@ -92,26 +230,82 @@ def main(p_level: int, sims: int, neg_rule: bool):
             "delta_pct": round(delta,2)
         })
 
+        with profiling.stage("npv_distribution", asset):
+            for (a, product, neg), (_, _, npv) in results.items():
+                if a != asset or npv is None: continue
+                for j, w in enumerate(waccs):
+                    col = npv[j] if isinstance(npv, list) else npv[:, j]
+                    dist_rows.append({"asset": asset, "market": market, "product": product,
+                                      "negative_rule": neg, "wacc": w, **npv_distribution(col)})
+
         gtmp = gen_fc.copy()
         gtmp["asset"] = asset; gtmp["market"] = market
         gen_fc_all.append(gtmp)
 
+    # portfolio: path-wise sum across assets (sim arrays only; sketches cannot be added path by path).
+    # Adaptive runs stop each asset at its own count, each a prefix of the same seeded run: sum the common prefix.
+    with profiling.stage("npv_distribution", "PORTFOLIO"):
+        for (product, neg) in sorted({(p, n) for _, p, n in results}):
+            paths = [results[(a, product, neg)][2] for a in ASSETS]
+            if any(x is None or isinstance(x, list) for x in paths): continue
+            n = min(len(x) for x in paths)
+            total = sum(x[:n] for x in paths)
+            for j, w in enumerate(waccs):
+                dist_rows.append({"asset": "PORTFOLIO", "market": "ALL", "product": product,
+                                  "negative_rule": neg, "wacc": w, **npv_distribution(total[:, j])})
+
     # outputs
-    prices_df = pd.DataFrame(price_rows).sort_values(["asset","product"])
-    prices_df.to_csv(os.path.join(CFG.OUT_RESULTS, "prices_summary.csv"), index=False)
+    with profiling.stage("write_csv"):
+        prices_df = pd.DataFrame(price_rows).sort_values(["asset","product"])
+        prices_df.to_csv(os.path.join(CFG.OUT_RESULTS, "prices_summary.csv"), index=False)
+
+        genout = pd.concat(gen_fc_all, ignore_index=True)
+        genout[["year","month","asset","market","expected_mwh","peak_mwh","off_mwh","peak_pct","off_pct"]].to_csv(
+            os.path.join(CFG.OUT_RESULTS, "generation_forecast.csv"), index=False
+        )
 
-    genout = pd.concat(gen_fc_all, ignore_index=True)
-    genout[["year","month","asset","market","expected_mwh","peak_mwh","off_mwh","peak_pct","off_pct"]].to_csv(
-        os.path.join(CFG.OUT_RESULTS, "generation_forecast.csv"), index=False
-    )
+        npvs = pd.DataFrame(npv_rows)
+        npvs.to_csv(os.path.join(CFG.OUT_RESULTS, "npv_summary.csv"), index=False)
 
-    npvs = pd.DataFrame(npv_rows)
-    npvs.to_csv(os.path.join(CFG.OUT_RESULTS, "npv_summary.csv"), index=False)
+        if dist_rows:
+            dist = pd.DataFrame(dist_rows).sort_values(["asset","product","negative_rule","wacc"])
+            dist.round(2).to_csv(os.path.join(CFG.OUT_RESULTS, "npv_distribution.csv"), index=False)
+        save_figure_specs(fig_specs)
+
+    if record:
+        with profiling.stage("record"):
+            dist_long = (pd.DataFrame(dist_rows).melt(id_vars=["asset", "market", "product", "negative_rule", "wacc"],
+                                                      var_name="metric")
+                         if dist_rows else pd.DataFrame(columns=TABLES["npv_distribution"]))
+            meta = dict(label=label, inputs_hash=stage_key("inputs", source_keys()),
+                        sim_key=f"{k_sim}-{cache.version}",
+                        p_level=p_level, sims=sims, neg_rule=neg_rule, engine=engine,
+                        args=dict(workers=workers, stream=stream, crn=crn, waccs=waccs, tolerance=tolerance,
+                                  antithetic=antithetic, stratify=stratify))
+            tables = {"prices": prices_df.rename(columns={"p75_price": "p_price"}), "generation": genout,
+                      "npv": npvs, "npv_distribution": dist_long}
+            sims_out = {k: (v, npv) for k, (v, _, npv) in results.items()} if CFG.RUNS_SAVE_SIMS else None
+            with RunStore() as store:
+                run_id = store.record(meta, tables, sims_out, terms,
+                                      terms_key=stage_key("terms", [term_keys[a] for a in ASSETS], cache.version))
 
     print("\n=== DONE ===")
     print(f"Wrote: {CFG.OUT_RESULTS}prices_summary.csv")
     print(f"Wrote: {CFG.OUT_RESULTS}generation_forecast.csv")
     print(f"Wrote: {CFG.OUT_RESULTS}npv_summary.csv")
+    if dist_rows: print(f"Wrote: {CFG.OUT_RESULTS}npv_distribution.csv")
+    if record: print(f"Recorded run {run_id} in {CFG.RUNS_DIR}runs.sqlite (query with runs.py)")
+    if plots:
+        render_plots(fig_specs)
+    else:
+        print("Skipped figures; render them later with --plots-only")
+
+def render_plots(specs=None, workers: int = None):
+    """plot stage: render saved histograms (default OUT_FIGS/histograms.json) to PNGs."""
+    specs = load_figure_specs() if specs is None else specs
+    with profiling.stage("plot"):
+        profiling.count("figures", len(specs))
+        render_figures(specs, workers)
     print(f"Figures in: {CFG.OUT_FIGS}")
 
 if __name__ == "__main__":
@@ -119,5 +313,74 @@ if __name__ == "__main__":
     ap.add_argument("--p", type=int, default=CFG.P_LEVEL, help="P-level (e.g., 75 → 25th percentile)")
     ap.add_argument("--sims", type=int, default=CFG.N_SIMS, help="Monte Carlo iterations")
     ap.add_argument("--neg-rule", action="store_true", help="Zero output when node price < 0")
+    ap.add_argument("--engine", choices=["vectorized", "hourly", "loop"], default=CFG.SIM_ENGINE,
+                    help="Simulation engine ('hourly' block-bootstraps history hours; 'loop' is the slow scalar reference)")
+    ap.add_argument("--workers", type=int, default=CFG.N_WORKERS,
+                    help="Simulation processes (results do not depend on this)")
+    ap.add_argument("--no-cache", action="store_true", help="Re-parse raw CSVs; skip the data/processed cache")
+    ap.add_argument("--stream", action="store_true", default=CFG.SIM_STREAM,
+                    help="Summarize sims in a mergeable quantile sketch (constant memory in --sims)")
+    ap.add_argument("--no-crn", action="store_true", default=not CFG.SIM_CRN,
+                    help="Draw each product/neg-rule independently instead of sharing draws per asset")
+    ap.add_argument("--wacc-sweep", type=lambda s: tuple(float(x) for x in s.split(",")), default=None,
+                    help="Comma-separated annual WACCs for the per-path NPV distribution (default: NPV_WACCS)")
+    ap.add_argument("--tolerance", type=float, default=CFG.SIM_TOLERANCE,
+                    help="Adaptive sims: stop once the P-level CI is this narrow in $/MWh (--sims becomes the cap)")
+    ap.add_argument("--antithetic", action="store_true", default=CFG.SIM_ANTITHETIC,
+                    help="Antithetic normal draws for generation (vectorized engine)")
+    ap.add_argument("--stratify", action="store_true", default=CFG.SIM_STRATIFY,
+                    help="Stratified RT hub regime draws per bucket (vectorized engine)")
+    ap.add_argument("--profile", action="store_true",
+                    help="Write per-stage timings/counters to outputs/results/profile.{csv,json}")
+    ap.add_argument("--cprofile", action="store_true",
+                    help="Also run under cProfile and dump outputs/results/profile.pstats")
+    ap.add_argument("--no-memo", action="store_true", help="Recompute every stage; do not read or write the stage cache")
+    ap.add_argument("--force", action="store_true", help="Invalidate all caches under PROC_DIR before running")
+    ap.add_argument("--no-plots", action="store_true", default=not CFG.PLOTS,
+                    help="Skip figure rendering (histograms are still saved for --plots-only)")
+    ap.add_argument("--plots-only", action="store_true",
+                    help="Only render figures from the histograms saved by the last run")
+    ap.add_argument("--plot-workers", type=int, default=CFG.PLOT_WORKERS,
+                    help="Figure rendering processes (default: cpu count)")
+    ap.add_argument("--serve", action="store_true",
+                    help="Run the local HTTP quoting service (warm inputs; see README) instead of a batch valuation")
+    ap.add_argument("--host", default=CFG.SERVICE_HOST, help="--serve bind address")
+    ap.add_argument("--port", type=int, default=CFG.SERVICE_PORT, help="--serve port")
+    ap.add_argument("--sweep", default=None, metavar="SPEC",
+                    help="Run a scenario grid from a YAML/JSON spec instead of the base valuation")
+    ap.add_argument("--assets", default=CFG.ASSET_REGISTRY, metavar="CSV",
+                    help="Asset registry CSV (asset,market,type,history) replacing CFG.ASSETS")
+    ap.add_argument("--raw-dir", default=None, metavar="DIR", help="Directory of the raw CSVs (default RAW_DIR)")
+    ap.add_argument("--no-record", action="store_true", default=not CFG.RECORD_RUNS,
+                    help="Do not append this run to the run history in RUNS_DIR")
+    ap.add_argument("--label", default=None, help="Label stored with the recorded run (see runs.py)")
+    ap.add_argument("--portfolio", action="store_true",
+                    help="Simulate all assets jointly on shared market draws; write portfolio_*.csv")
     args = ap.parse_args()
-    main(p_level=args.p, sims=args.sims, neg_rule=args.neg_rule)
+    if args.raw_dir:
+        CFG.RAW_DIR = os.path.join(args.raw_dir, "")
+    ASSETS = use_registry(args.assets)
+    CFG.PLOT_WORKERS = args.plot_workers
+    if args.plots_only:
+        render_plots()
+        raise SystemExit
+    if args.serve:
+        if args.force: shutil.rmtree(CFG.PROC_DIR, ignore_errors=True)
+        memo = not args.no_memo
+        serve(lambda: _prepare(not args.no_cache, memo)[1:], args.host, args.port,
+              args.workers if args.workers > 1 else None)
+        raise SystemExit
+    if args.sweep:
+        if args.force: shutil.rmtree(CFG.PROC_DIR, ignore_errors=True)
+        run_sweep_cli(args.sweep, use_cache=not args.no_cache, memo=not args.no_memo)
+        raise SystemExit
+    if args.portfolio:
+        if args.force: shutil.rmtree(CFG.PROC_DIR, ignore_errors=True)
+        run_portfolio_cli(args.p, args.sims, args.neg_rule, args.workers,
+                          use_cache=not args.no_cache, memo=not args.no_memo)
+        raise SystemExit
+    main(p_level=args.p, sims=args.sims, neg_rule=args.neg_rule, engine=args.engine, workers=args.workers,
+         use_cache=not args.no_cache, stream=args.stream, crn=not args.no_crn, waccs=args.wacc_sweep,
+         tolerance=args.tolerance, antithetic=args.antithetic, stratify=args.stratify,
+         profile=args.profile, cprofile=args.cprofile, memo=not args.no_memo, force=args.force,
+         plots=not args.no_plots, record=not args.no_record, label=args.label)
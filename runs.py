@@ -0,0 +1,115 @@
+"""
+Query the run history that main.py records in RUNS_DIR.
+
+    python runs.py list
+    python runs.py show latest --table prices
+    python runs.py diff -2 -1                      # previous run vs latest, prices table
+    python runs.py trend Mantero --product RT_BUS  # P-level price across runs
+    python runs.py revalue 3 --p 90                # re-price run 3 at P90 from its stored sims
+    python runs.py plot 3                          # re-render run 3's figures
+    python runs.py export 3 --out /tmp/run3        # run 3's CSVs
+
+RUN is a run id, 'latest' or a negative offset (-1 = latest).
+"""
+import argparse
+import os
+import pandas as pd
+
+from src.config import CFG
+from src.runstore import RunStore, TABLES, revalue
+from src.utils import ensure_dirs
+from src.valuation import p_level_price
+from src.visualization import figure_spec, render_figures
+
+def export_run(store: RunStore, run, out_dir: str):
+    """Write a recorded run's tables as the CSVs main.py writes for the current run."""
+    ensure_dirs(out_dir)
+    prices = store.table("prices", run).rename(columns={"p_price": "p75_price"})
+    prices.to_csv(os.path.join(out_dir, "prices_summary.csv"), index=False)
+    gen = store.table("generation", run)
+    gen[["year","month","asset","market","expected_mwh","peak_mwh","off_mwh","peak_pct","off_pct"]].to_csv(
+        os.path.join(out_dir, "generation_forecast.csv"), index=False)
+    store.table("npv", run).to_csv(os.path.join(out_dir, "npv_summary.csv"), index=False)
+    dist = store.table("npv_distribution", run)
+    if len(dist):
+        keys = ["asset", "market", "product", "negative_rule", "wacc"]
+        dist = dist.pivot_table(index=keys, columns="metric", values="value", sort=False).reset_index()
+        dist.columns.name = None
+        dist.sort_values(keys[:1] + keys[2:]).round(2).to_csv(os.path.join(out_dir, "npv_distribution.csv"),
+                                                              index=False)
+    return out_dir
+
+def plot_run(store: RunStore, run, p_level: int, out_dir: str, workers: int = None):
+    """Histograms of a recorded run's simulated $/MWh (no negative rule), as main.py draws them."""
+    ensure_dirs(out_dir)
+    specs = []
+    for (asset, product, neg), (sims, _) in sorted(store.load_sims(run).items()):
+        if neg: continue
+        p = p_level_price(sims, p_level)
+        specs.append(figure_spec(sim_prices=sims, p75=p, out_path=os.path.join(out_dir, f"{asset}_{product}_dist.png"),
+                                 title=f"{asset} {product} Distribution (P{p_level}={p:.2f})"))
+    render_figures(specs, workers)
+    return len(specs)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Query the recorded run history (see README 'Run History')")
+    ap.add_argument("--root", default=CFG.RUNS_DIR, help="Run history directory (default RUNS_DIR)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("list", help="Recorded runs, newest first")
+    p.add_argument("--limit", type=int, default=20)
+    p = sub.add_parser("show", help="One run's config and a summary table")
+    p.add_argument("run")
+    p.add_argument("--table", choices=list(TABLES), default="prices")
+    p = sub.add_parser("diff", help="Side-by-side values and deltas of two runs")
+    p.add_argument("a"); p.add_argument("b")
+    p.add_argument("--table", choices=[t for t in TABLES if t != "sims"], default="prices")
+    p.add_argument("--changed", action="store_true", help="Only rows with a nonzero delta")
+    p = sub.add_parser("trend", help="One asset's metric across runs")
+    p.add_argument("asset")
+    p.add_argument("--product", default=None)
+    p.add_argument("--metric", default="p_price")
+    p.add_argument("--table", choices=["prices", "npv"], default="prices")
+    p = sub.add_parser("revalue", help="Re-price a run at another P-level from its stored sims")
+    p.add_argument("run")
+    p.add_argument("--p", type=int, required=True)
+    p.add_argument("--neg-rule", choices=["run", "on", "off"], default="run")
+    p = sub.add_parser("plot", help="Re-render a run's distribution figures from its stored sims")
+    p.add_argument("run")
+    p.add_argument("--p", type=int, default=None, help="P-level line (default: the run's)")
+    p.add_argument("--out", default=CFG.OUT_FIGS)
+    p.add_argument("--workers", type=int, default=CFG.PLOT_WORKERS)
+    p = sub.add_parser("export", help="Write a run's CSVs")
+    p.add_argument("run")
+    p.add_argument("--out", default=CFG.OUT_RESULTS)
+    args = ap.parse_args()
+
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_columns", 30)
+    with RunStore(args.root) as store:
+        try:
+            if args.cmd == "list":
+                print(store.runs(args.limit).to_string(index=False))
+            elif args.cmd == "show":
+                m = store.meta(args.run)
+                print(f"run {m['run_id']} {m['created']} label={m['label']} engine={m['engine']} "
+                      f"p={m['p_level']} sims={m['sims']} neg_rule={bool(m['neg_rule'])} inputs={m['inputs_hash']}")
+                print(store.table(args.table, m["run_id"]).to_string(index=False))
+            elif args.cmd == "diff":
+                d = store.diff(args.a, args.b, args.table)
+                if args.changed:
+                    deltas = d.filter(like="_delta")
+                    d = d[(deltas.fillna(1).abs() > 1e-9).any(axis=1)]
+                print(d.to_string(index=False))
+            elif args.cmd == "trend":
+                print(store.trend(args.asset, args.product, args.metric, args.table).to_string(index=False))
+            elif args.cmd == "revalue":
+                neg = None if args.neg_rule == "run" else args.neg_rule == "on"
+                print(revalue(store, args.run, args.p, neg).to_string(index=False))
+            elif args.cmd == "plot":
+                p_level = args.p or int(store.meta(args.run)["p_level"])
+                n = plot_run(store, args.run, p_level, args.out, args.workers)
+                print(f"Rendered {n} figures in {args.out}")
+            elif args.cmd == "export":
+                print(f"Wrote run {store.resolve(args.run)} CSVs to {export_run(store, args.run, args.out)}")
+        except ValueError as e:
+            raise SystemExit(f"error: {e}")
@@ -1,31 +1,165 @@
+from dataclasses import dataclass
 import numpy as np
 import pandas as pd
 from .config import CFG
+from . import profiling
+
+PERIODS = ("Peak", "Off-Peak")
+REGIMES = ("LOW", "HIGH")
+FIELDS  = {"gen": "Gen", "rt_hub": "RT_Hub", "da_hub": "DA_Hub", "rt_basis": "RT_Basis", "da_basis": "DA_Basis"}
+ROLLING_MIN_HOURS = 24  # min_periods of the regime rolling std
+
+def _period_index(period):
+    if isinstance(period, str): return PERIODS.index(period)
+    p = np.asarray(period)
+    if p.dtype.kind in "OUS": return np.where(p=="Peak", 0, 1)
+    return p
+
+def regime_flags(rollstd: np.ndarray):
+    """HIGH where the RT hub rolling std is above its median over the history (NaN windows are LOW)."""
+    ok = ~np.isnan(rollstd)
+    return rollstd > np.median(rollstd[ok]) if ok.any() else np.zeros(len(rollstd), dtype=bool)
+
+@dataclass
+class BucketStore:
+    """
+    Historical samples for every (month, period, regime) bucket, one contiguous
+    float64 array per field. Within a field, rows are ordered by (month, period,
+    regime, time), so `offsets[f][m-1, p, r]` / `lengths[f][m-1, p, r]` address a
+    regime slice and the LOW+HIGH run starting at regime 0 is the whole bucket.
+    """
+    data: dict          # field -> float64[n]
+    offsets: dict       # field -> int64[12, 2, 2]
+    lengths: dict       # field -> int64[12, 2, 2]
+    means: dict         # field -> float64[12, 2] (NaN where empty)
+    n_rows: np.ndarray  # int64[12, 2] history rows per bucket (incl. NaNs)
+    p_high: float
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame):
+        """From one asset frame, with pandas' rolling std for the regime tags."""
+        rollstd = df["RT_Hub"].rolling(CFG.ROLLING_STD_HOURS, min_periods=ROLLING_MIN_HOURS).std().to_numpy()
+        return cls.from_columns(df.index.month.to_numpy() - 1, np.where(df["is_peak"].to_numpy(), 0, 1),
+                                regime_flags(rollstd), {f: df[col].to_numpy(dtype=float) for f, col in FIELDS.items()})
+
+    @classmethod
+    def from_columns(cls, month0, per, high, cols: dict):
+        """
+        Single pass over aligned hourly columns (0-based month, period 0=Peak,
+        HIGH flags, {field: values}): one stable sort on a (month, period,
+        regime) code, then bincounts.
+        """
+        code = (month0*4 + per*2 + high).astype(np.int8)     # small ints: numpy's stable sort is a radix sort
+        order = np.argsort(code, kind="stable")
+        code_s = code[order]
+
+        data, offsets, lengths, means = {}, {}, {}, {}
+        for f in FIELDS:
+            v = cols[f][order]
+            ok = ~np.isnan(v)
+            cnt = np.bincount(code_s[ok], minlength=48)
+            off = np.concatenate([[0], np.cumsum(cnt)[:-1]])
+            data[f] = np.ascontiguousarray(v[ok])
+            offsets[f] = off.reshape(12, 2, 2)
+            lengths[f] = cnt.reshape(12, 2, 2)
+            tot = np.bincount(code_s[ok]//2, weights=v[ok], minlength=24).reshape(12, 2)
+            n = lengths[f].sum(axis=2)
+            means[f] = np.divide(tot, n, out=np.full((12, 2), np.nan), where=n>0)
+        n_rows = np.bincount(code//2, minlength=24).reshape(12, 2)
+        return cls(data, offsets, lengths, means, n_rows, float(high.mean()))
+
+    def arrays(self):
+        """Flat name -> ndarray view (for shared memory / serialization)."""
+        out = {"n_rows": self.n_rows, "p_high": np.array([self.p_high])}
+        for f in FIELDS:
+            out[f"{f}.data"] = self.data[f]
+            out[f"{f}.offsets"] = self.offsets[f]
+            out[f"{f}.lengths"] = self.lengths[f]
+            out[f"{f}.means"] = self.means[f]
+        return out
+
+    @classmethod
+    def from_arrays(cls, arrs: dict):
+        pick = lambda kind: {f: arrs[f"{f}.{kind}"] for f in FIELDS}
+        return cls(pick("data"), pick("offsets"), pick("lengths"), pick("means"),
+                   arrs["n_rows"], float(arrs["p_high"][0]))
+
+    def has(self, month, period):
+        return self.n_rows[np.asarray(month)-1, _period_index(period)] > 0
+
+    def count(self, field, month, period, regime=None):
+        ln = self.lengths[field][np.asarray(month)-1, _period_index(period)]
+        return ln.sum(axis=-1) if regime is None else ln[..., REGIMES.index(regime)]
+
+    def mean(self, field, month, period):
+        return self.means[field][np.asarray(month)-1, _period_index(period)]
+
+    def values(self, field, month: int, period, regime=None):
+        """Contiguous view of one bucket (or one regime slice of it)."""
+        r = 0 if regime is None else REGIMES.index(regime)
+        o = int(self.offsets[field][month-1, _period_index(period), r])
+        return self.data[field][o:o+int(self.count(field, month, period, regime))]
+
+    def sample(self, field, month, period, rng, size=None, regime=None):
+        """
+        Bootstrap draw(s). Scalar month/period with size=None gives a float;
+        array month/period broadcast against `size` give one draw per cell.
+        Empty buckets draw 0.0.
+        """
+        mi, pi = np.asarray(month)-1, _period_index(period)
+        r = 0 if regime is None else REGIMES.index(regime)
+        off = self.offsets[field][mi, pi, r]
+        ln = self.count(field, month, period, regime)
+        if size is None and np.ndim(off)==0:
+            if ln==0: return 0.0
+            return float(self.data[field][off + rng.integers(0, ln)])
+        data = self.data[field]
+        if len(data)==0: return np.zeros(np.broadcast_shapes(size or (), np.shape(off)))
+        idx = rng.integers(0, np.maximum(ln, 1), size=size)
+        profiling.count("bucket_draws", idx.size)
+        return np.where(ln>0, data[np.where(ln>0, off + idx, 0)], 0.0)
+
+    def basis_means(self):
+        """{((month, period), 'RT'|'DA'): mean basis} for the component breakdown."""
+        out = {}
+        for m in range(1,13):
+            for j, per in enumerate(PERIODS):
+                if not self.n_rows[m-1, j]: continue
+                for mk in ("RT", "DA"):
+                    v = self.means[f"{mk.lower()}_basis"][m-1, j]
+                    out[((m, per), mk)] = 0.0 if np.isnan(v) else float(v)
+        return out
+
+    # dict-of-buckets view, kept for the scalar reference engine
+    def get(self, key, default=None):
+        m, per = key
+        if not (1 <= m <= 12) or not self.has(m, per): return default
+        b = {f: self.values(f, m, per) for f in FIELDS}
+        b["rt_hub_high"] = self.values("rt_hub", m, per, "HIGH")
+        b["rt_hub_low"]  = self.values("rt_hub", m, per, "LOW")
+        return b
+
+    def keys(self):
+        return [(m, per) for m in range(1,13) for j, per in enumerate(PERIODS) if self.n_rows[m-1, j]]
+
+    def items(self):
+        return [(k, self.get(k)) for k in self.keys()]
+
+    def __getitem__(self, key):
+        b = self.get(key)
+        if b is None: raise KeyError(key)
+        return b
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self.keys())
 
 def build_hist_buckets(df: pd.DataFrame):
     """
     Bucket history by (month, period). Tag regimes (HIGH/LOW) using RT hub rolling std.
-    Returns (buckets, p_high)
+    Returns (BucketStore, p_high)
     """
-    df = df.copy()
-    df["month"] = df.index.month
-    df["rt_hub_rollstd"] = df["RT_Hub"].rolling(CFG.ROLLING_STD_HOURS, min_periods=24).std()
-    thr = df["rt_hub_rollstd"].median(skipna=True)
-    df["regime"] = np.where(df["rt_hub_rollstd"] > thr, "HIGH", "LOW")
-
-    buckets = {}
-    for m in range(1,13):
-        for per in ["Peak","Off-Peak"]:
-            b = df[(df["month"]==m)&(df["period"]==per)]
-            if b.empty: continue
-            buckets[(m, per)] = {
-                "gen": b["Gen"].dropna(),
-                "rt_hub": b["RT_Hub"].dropna(),
-                "da_hub": b["DA_Hub"].dropna(),
-                "rt_basis": b["RT_Basis"].dropna(),
-                "da_basis": b["DA_Basis"].dropna(),
-                "rt_hub_high": b[b["regime"]=="HIGH"]["RT_Hub"].dropna(),
-                "rt_hub_low":  b[b["regime"]=="LOW"]["RT_Hub"].dropna(),
-            }
-    p_high = float((df["regime"]=="HIGH").mean())
-    return buckets, p_high
+    store = BucketStore.from_frame(df)
+    return store, store.p_high
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from .utils import umask_mode
+
+FORMAT_VERSION = 1
+
+def file_digest(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def cache_key(path, *parts):
+    """Content hash of `path` plus any config values the cached result depends on."""
+    h = hashlib.sha256(f"v{FORMAT_VERSION}".encode())
+    h.update(file_digest(path).encode())
+    h.update(json.dumps(parts, default=str).encode())
+    return h.hexdigest()[:16]
+
+def save_frame(df: pd.DataFrame, out_dir: str):
+    """
+    Write `df` as one .npy file per column (plus the index) and a meta.json.
+    Object/categorical columns are stored as integer codes + categories.
+    Written to a temp dir and renamed into place, so readers never see a partial cache.
+    """
+    parent = os.path.dirname(out_dir.rstrip("/")) or "."
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    os.chmod(tmp, umask_mode(0o777))              # mkdtemp creates 0700
+    cols = []
+    for i, (name, s) in enumerate([("__index__", df.index.to_series())] + list(df.items())):
+        fn = f"c{i}.npy"
+        if isinstance(s.dtype, pd.CategoricalDtype) or s.dtype == object:
+            cat = s.astype("category")
+            np.save(os.path.join(tmp, fn), cat.cat.codes.to_numpy())
+            cols.append({"name": name, "file": fn, "kind": "category" if s.dtype != object else "object",
+                         "categories": cat.cat.categories.tolist(), "ordered": bool(cat.cat.ordered)})
+        else:
+            np.save(os.path.join(tmp, fn), s.to_numpy())
+            cols.append({"name": name, "file": fn, "kind": "array"})
+    meta = {"version": FORMAT_VERSION, "rows": len(df), "index_name": df.index.name, "columns": cols}
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    try:
+        os.replace(tmp, out_dir)
+    except OSError:                               # another writer got there first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def load_frame(in_dir: str):
+    """Reload a save_frame() directory; numeric columns are memory-mapped read-only."""
+    with open(os.path.join(in_dir, "meta.json")) as f:
+        meta = json.load(f)
+    data = {}
+    for c in meta["columns"]:
+        a = np.load(os.path.join(in_dir, c["file"]), mmap_mode="r")
+        if c["kind"] == "array":
+            data[c["name"]] = a
+        else:
+            cat = pd.Categorical.from_codes(np.asarray(a), categories=c["categories"], ordered=c["ordered"])
+            data[c["name"]] = cat if c["kind"] == "category" else np.asarray(cat, dtype=object)
+    idx = pd.Index(data.pop("__index__"), name=meta["index_name"])
+    return pd.DataFrame(data, index=idx, copy=False)
+
+def cached_frame(src_path: str, build, key_parts=(), cache_dir: str = None, use_cache: bool = True):
+    """
+    Return build(src_path), persisted under cache_dir/<stem>-<path hash>-<key>/.
+    A changed source file or key part yields a new key; stale entries for the
+    same path are removed (same-named files in other directories keep theirs).
+    """
+    if not use_cache or cache_dir is None:
+        return build(src_path)
+    name = os.path.splitext(os.path.basename(src_path))[0]
+    stem = f"{name}-{hashlib.sha256(os.path.abspath(src_path).encode()).hexdigest()[:8]}"
+    key = cache_key(src_path, *key_parts)
+    entry = os.path.join(cache_dir, f"{stem}-{key}")
+    if os.path.exists(os.path.join(entry, "meta.json")):
+        try:
+            return load_frame(entry)
+        except (OSError, ValueError, KeyError):
+            pass                                  # corrupt entry: rebuild below
+    df = build(src_path)
+    if os.path.isdir(cache_dir):
+        for d in os.listdir(cache_dir):
+            if d.rsplit("-", 1)[0] in (stem, name) and d != os.path.basename(entry):   # name: pre-path-hash layout
+                shutil.rmtree(os.path.join(cache_dir, d), ignore_errors=True)
+    save_frame(df, entry)
+    return df
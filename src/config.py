@@ -3,22 +3,58 @@ from dataclasses import dataclass
 @dataclass
 class Config:
     ASSETS: dict = None
+    ASSET_REGISTRY: str = None                # CSV asset,market,type[,history] replacing ASSETS (main.py --assets)
     PRODUCTS: tuple = ("RT_HUB", "RT_BUS", "DA_HUB", "DA_BUS")
     PEAK_HOURS: tuple = tuple(range(7, 23))    # HE 7–22
     PEAK_DAYS: tuple = (0,1,2,3,4)            # Mon–Fri
     FORECAST_START_YEAR: int = 2026
     FORECAST_YEARS: int = 5
     WACC_ANNUAL: float = 0.05
+    NPV_P_LEVELS: tuple = (50, 75, 90, 95)    # reported per-path NPV P-levels
+    NPV_CVAR_LEVEL: int = 95                  # CVaR = mean of the worst 5% of NPV paths
+    NPV_WACCS: tuple = (0.05,)                # rates for npv_distribution.csv (main.py --wacc-sweep)
     N_SIMS: int = 3000
     P_LEVEL: int = 75
     RANDOM_SEED: int = 504
+    SIM_ENGINE: str = "vectorized"            # "vectorized" | "hourly" (block bootstrap) | "loop" (scalar reference)
+    SIM_BLOCK_SIZE: int = 10_000              # sims per vectorized block (bounds memory)
+    N_WORKERS: int = 1                        # simulation processes (main.py --workers)
+    SIM_CRN: bool = True                      # common random numbers across products/neg-rule (main.py --no-crn)
+    SIM_STREAM: bool = False                  # summarize sims in a QuantileSketch instead of keeping arrays
+    SKETCH_ALPHA: float = 1e-4                # sketch relative quantile error
+    STREAM_SHARD_SIMS: int = 1_000_000        # sims per parallel shard in streaming mode
+    SIM_TOLERANCE: float = None               # adaptive mode: stop once the P-level CI is this narrow ($/MWh)
+    SIM_BATCH: int = 1_000                    # adaptive mode: sims per convergence check
+    CI_LEVEL: float = 0.95                    # confidence level of the reported P-level interval
+    SIM_ANTITHETIC: bool = False              # antithetic normal draws for generation (vectorized)
+    SIM_STRATIFY: bool = False                # stratified RT hub regime draws per bucket (vectorized)
+    HOURLY_BLOCK_DAYS: int = 7                # hourly engine: contiguous history days per bootstrap block
+    HOURLY_WINDOW_DAYS: int = 21              # blocks start within +/- this many days of the same day-of-year
+    HOURLY_BLOCK_SIMS: int = 32               # paths per vectorized chunk (memory ~ 10 x this x 8 bytes x 43,824 h)
+    HOURLY_SHARD_SIMS: int = 250              # paths per parallel task
+    PORTFOLIO_CHUNK_ASSETS: int = 25          # portfolio: assets per task (tasks never span markets)
     NEGATIVE_PRICE_RULE_DEFAULT: bool = False
     ROLLING_STD_HOURS: int = 24*30            # regime window
     BASIS_STRESS_ALPHA: float = 0.3           # congestion stress scaler
     RAW_DIR: str = "data/raw/"
-    PROC_DIR: str = "data/processed/"
+    PROC_DIR: str = "data/processed/"        # columnar cache of augmented history
+    USE_CACHE: bool = True                    # main.py --no-cache disables
+    MEMO_DIR: str = "data/processed/stages/"  # memoized stage results (main.py --no-memo / --force)
+    USE_MEMO: bool = True
+    MEMO_MAX_MB: float = 2048                 # LRU-evicted beyond this size
     OUT_RESULTS: str = "outputs/results/"
     OUT_FIGS: str = "outputs/figures/"
+    RUNS_DIR: str = "outputs/runs/"           # run history: runs.sqlite + sim arrays (runs.py queries it)
+    RECORD_RUNS: bool = True                  # append every valuation to RUNS_DIR (main.py --no-record)
+    RUNS_SAVE_SIMS: bool = True               # also keep compressed per-path arrays for re-plotting/re-valuation
+    PLOTS: bool = True                        # render figures after valuation (main.py --no-plots)
+    PLOT_WORKERS: int = None                  # figure rendering processes (None = cpu count)
+    PLOT_DPI: int = 160
+    SERVICE_HOST: str = "127.0.0.1"           # main.py --serve
+    SERVICE_PORT: int = 8750
+    SERVICE_WORKERS: int = None               # quote simulation processes (None = cpu count)
+    SERVICE_CACHE: int = 64                   # (asset, sims) simulations kept warm
+    SERVICE_MAX_SIMS: int = 200_000
 
     def __post_init__(self):
         if self.ASSETS is None:
@@ -1,41 +1,81 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 from .config import CFG
+from .cache import cached_frame, cache_key
+from . import profiling
+
+PRICE_COLS = ["Gen", "RT_Busbar", "RT_Hub", "DA_Busbar", "DA_Hub"]
+_RENAME = {"RT Busbar":"RT_Busbar","RT Hub":"RT_Hub","DA Busbar":"DA_Busbar","DA Hub":"DA_Hub"}
+_DTYPES = {**{c: "float64" for c in PRICE_COLS + list(_RENAME)}, "HE": "int64", "P/OP": "category"}
 
 def _augment(df):
     df["RT_Basis"] = df["RT_Busbar"] - df["RT_Hub"]
     df["DA_Basis"] = df["DA_Busbar"] - df["DA_Hub"]
-    df["hour"] = df.index.hour
-    df["dow"] = df.index.dayofweek
+    df["hour"] = df.index.hour.astype("int8")
+    df["dow"] = df.index.dayofweek.astype("int8")
     df["is_peak"] = df["dow"].isin(CFG.PEAK_DAYS) & df["hour"].isin(CFG.PEAK_HOURS)
-    df["period"] = df["is_peak"].map({True:"Peak", False:"Off-Peak"})
+    df["period"] = pd.Categorical.from_codes(np.where(df["is_peak"], 0, 1), categories=["Peak","Off-Peak"])
     return df
 
 def _read_asset_csv(path):
-    df = pd.read_csv(path)
-    df["Date"] = pd.to_datetime(df["Date"])
-    df["datetime"] = df.apply(lambda r: r["Date"] + pd.to_timedelta(int(r["HE"])-1, unit="h"), axis=1)
-    df = df.set_index("datetime").sort_index()
-    df = df.rename(columns={"RT Busbar":"RT_Busbar","RT Hub":"RT_Hub","DA Busbar":"DA_Busbar","DA Hub":"DA_Hub"})
+    df = pd.read_csv(path, dtype=_DTYPES)
+    df["Date"] = pd.to_datetime(df["Date"], format="ISO8601")
+    hours = (df["HE"].to_numpy() - 1) * np.timedelta64(1, "h")
+    df.index = pd.DatetimeIndex(df["Date"].to_numpy() + hours, name="datetime")
+    df = df.sort_index()
+    df = df.rename(columns=_RENAME)
     _augment(df)
     return df
 
-def load_assets():
-    assets = {}
-    for name, meta in CFG.ASSETS.items():
-        market = meta["market"]
-        csv = os.path.join(CFG.RAW_DIR, f"{market.lower()}_{name.lower()}.csv")
+def _asset_csv_path(name, meta):
+    """meta["history"] (registry, relative to RAW_DIR) or the default <market>_<asset>.csv."""
+    return os.path.join(CFG.RAW_DIR, meta.get("history") or f"{meta['market'].lower()}_{name.lower()}.csv")
+
+def _asset_cache_parts():
+    return (tuple(CFG.PEAK_HOURS), tuple(CFG.PEAK_DAYS))
+
+def load_asset(path, use_cache: bool = None):
+    """Augmented hourly frame for one CSV, via the columnar cache in CFG.PROC_DIR."""
+    use_cache = CFG.USE_CACHE if use_cache is None else use_cache
+    return cached_frame(path, _read_asset_csv, _asset_cache_parts(), CFG.PROC_DIR, use_cache)
+
+def load_assets(workers: int = None, use_cache: bool = None):
+    """Read every CFG.ASSETS history concurrently (pandas' parser releases the GIL)."""
+    paths = {name: _asset_csv_path(name, meta) for name, meta in CFG.ASSETS.items()}
+    for csv in paths.values():
         if not os.path.exists(csv):
             raise FileNotFoundError(f"Missing {csv}. Run convert_to_csv.py first.")
-        assets[name] = _read_asset_csv(csv)
-    return assets
+    workers = workers or min(len(paths), os.cpu_count() or 1) or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        frames = pool.map(lambda kv: _load_timed(kv[0], kv[1], use_cache), paths.items())
+        return dict(zip(paths, frames))
 
-def load_forwards():
-    fcsv = os.path.join(CFG.RAW_DIR, "forward_curves.csv")
-    if not os.path.exists(fcsv):
-        raise FileNotFoundError("Missing forward_curves.csv. Run convert_to_csv.py first.")
-    fw = pd.read_csv(fcsv)
+def _load_timed(name, path, use_cache):
+    with profiling.stage("load", name):
+        return load_asset(path, use_cache)
+
+def _read_forwards_csv(path):
+    fw = pd.read_csv(path)
     fw["date"] = pd.to_datetime(fw["Month"])
     fw["year"] = fw["date"].dt.year
     fw["month"] = fw["date"].dt.month
     return fw
+
+def load_forwards(use_cache: bool = None):
+    fcsv = os.path.join(CFG.RAW_DIR, "forward_curves.csv")
+    if not os.path.exists(fcsv):
+        raise FileNotFoundError("Missing forward_curves.csv. Run convert_to_csv.py first.")
+    use_cache = CFG.USE_CACHE if use_cache is None else use_cache
+    with profiling.stage("load", "forwards"):
+        return cached_frame(fcsv, _read_forwards_csv, (), CFG.PROC_DIR, use_cache)
+
+def source_keys():
+    """Content keys of every raw input ({asset: key, 'forwards': key}), as used by the frame cache."""
+    paths = {name: _asset_csv_path(name, meta) for name, meta in CFG.ASSETS.items()}
+    paths["forwards"] = os.path.join(CFG.RAW_DIR, "forward_curves.csv")
+    for p in paths.values():
+        if not os.path.exists(p):
+            raise FileNotFoundError(f"Missing {p}. Run convert_to_csv.py first.")
+    return {name: cache_key(p, *(() if name == "forwards" else _asset_cache_parts())) for name, p in paths.items()}
@@ -0,0 +1,136 @@
+"""
+Single-pass feature engine over many assets' hourly histories.
+
+The RT hub rolling std (regime tags) and generation moments of every asset are
+computed together over stacked column arrays, each asset a segment; bucket
+stores are then cut from each asset's own columns. With a state directory, an
+asset whose history only grew by appended hours reuses its saved rolling std
+and moments and summarizes just the new rows (plus the ROLLING_STD_HOURS - 1
+rows their windows reach back into). Regime tags are re-derived from the full
+rolling std, as the median threshold moves with every new hour.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from .config import CFG
+from . import profiling
+from .analysis import BucketStore, FIELDS, ROLLING_MIN_HOURS, regime_flags
+from .forecasting import GenStats
+from .memo import stage_key, config_parts
+from .utils import umask_mode
+
+STATE_VERSION = 2
+
+def rolling_std(x: np.ndarray, seg: np.ndarray, window: int, min_periods: int = ROLLING_MIN_HOURS):
+    """
+    pandas' Series.rolling(window, min_periods).std() restarted at every segment
+    (seg: non-decreasing segment id per row), from windowed cumulative sums of
+    values demeaned per segment.
+    """
+    n = len(x)
+    if not n: return np.zeros(0)
+    ok = ~np.isnan(x)
+    n_seg = int(seg[-1]) + 1
+    cnt = np.bincount(seg, ok, n_seg)
+    mu = np.bincount(seg, np.where(ok, x, 0.0), n_seg) / np.maximum(cnt, 1)
+    z = np.where(ok, x - mu[seg], 0.0)
+    c, s, q = (np.concatenate([[0.0], np.cumsum(a)]) for a in (ok, z, z*z))
+    i = np.arange(n)
+    lo = np.maximum(np.searchsorted(seg, seg), i - window + 1)
+    m, sm, sq = c[i+1] - c[lo], s[i+1] - s[lo], q[i+1] - q[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = (sq - sm*sm/m) / (m - 1)
+    return np.where(m >= max(min_periods, 2), np.sqrt(np.maximum(var, 0.0)), np.nan)
+
+def _columns(df: pd.DataFrame):
+    """(0-based month, period 0=Peak) per row, read off the index and is_peak without copying the frame."""
+    return df.index.month.to_numpy() - 1, np.where(df["is_peak"].to_numpy(), 0, 1)
+
+def _digest(df: pd.DataFrame, n: int):
+    """Hash of the first n rows of everything the saved state was computed from."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(df.index.asi8[:n].tobytes())
+    for col in ("RT_Hub", "Gen"):
+        h.update(df[col].to_numpy(dtype=float)[:n].tobytes())
+    return h.hexdigest()
+
+def _state_key():
+    return stage_key("features", STATE_VERSION,
+                     config_parts("ROLLING_STD_HOURS", "PEAK_HOURS", "PEAK_DAYS"))
+
+@dataclass
+class FeatureState:
+    """An asset's summarized history: rows seen, their digest, RT hub rolling std and generation moments."""
+    n: int
+    digest: str
+    rollstd: np.ndarray
+    gen: GenStats
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((_state_key(), self), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.chmod(tmp, umask_mode())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """The saved state, or None if missing, unreadable or built under other settings."""
+        try:
+            with open(path, "rb") as f:
+                key, state = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return None
+        return state if key == _state_key() else None
+
+def build_features(frames: dict, state_dir: str = None):
+    """
+    {asset: (BucketStore, GenStats)} for every frame, in one stacked pass over
+    the rows not yet summarized. With state_dir, per-asset state is read from
+    and written back to state_dir/<asset>.pkl; a frame that does not extend
+    its saved history (edited rows, other settings) is summarized in full.
+    """
+    window = CFG.ROLLING_STD_HOURS
+    cols, states, seen = {}, {}, {}
+    for a, df in frames.items():
+        cols[a] = _columns(df)
+        st = FeatureState.load(os.path.join(state_dir, f"{a}.pkl")) if state_dir else None
+        if st is not None and not (st.n <= len(df) and _digest(df, st.n) == st.digest):
+            st = None
+        states[a], seen[a] = st, (st.n if st else 0)
+    todo = [a for a in frames if seen[a] < len(frames[a])]
+
+    # stacked segments: each asset's new rows led by the seen rows their windows reach back into
+    ctx = {a: max(seen[a] - (window - 1), 0) for a in todo}
+    lens = [len(frames[a]) - ctx[a] for a in todo]
+    seg = np.repeat(np.arange(len(todo)), lens)
+    hub = np.concatenate([frames[a]["RT_Hub"].to_numpy(dtype=float)[ctx[a]:] for a in todo] or [np.zeros(0)])
+    new = np.concatenate([np.arange(ctx[a], len(frames[a])) >= seen[a] for a in todo] or [np.zeros(0, bool)])
+    rs = rolling_std(hub, seg, window)[new]
+    pick = lambda j: np.concatenate([cols[a][j][seen[a]:] for a in todo] or [np.zeros(0, np.int64)])
+    gen = np.concatenate([frames[a]["Gen"].to_numpy(dtype=float)[seen[a]:] for a in todo] or [np.zeros(0)])
+    gens = GenStats.stacked(seg[new], len(todo), pick(0), pick(1), gen)
+    profiling.count("feature_rows", int(new.sum()))
+    profiling.count("feature_rows_reused", sum(seen.values()))
+
+    parts = np.split(rs, np.cumsum([len(frames[a]) - seen[a] for a in todo])[:-1]) if todo else []
+    for a, rollstd, g in zip(todo, parts, gens):
+        st = states[a]
+        state = FeatureState(len(frames[a]), _digest(frames[a], len(frames[a])),
+                             np.concatenate([st.rollstd, rollstd]) if st else rollstd,
+                             st.gen.merge(g) if st else g)
+        if state_dir:
+            state.save(os.path.join(state_dir, f"{a}.pkl"))
+        states[a] = state
+    out = {}
+    for a, df in frames.items():
+        st = states[a]
+        store = BucketStore.from_columns(*cols[a], regime_flags(st.rollstd),
+                                         {f: df[col].to_numpy(dtype=float) for f, col in FIELDS.items()})
+        out[a] = (store, st.gen)
+    return out
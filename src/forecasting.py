@@ -1,38 +1,88 @@
+from dataclasses import dataclass
+import numpy as np
 import pandas as pd
 from .config import CFG
+from .analysis import BucketStore
 from .utils import month_hours_map
 
+@dataclass
+class GenStats:
+    """
+    Per-calendar-month generation moments (count, mean and variance of non-NaN
+    hours), hours seen and (month, period) MWh totals. Mergeable, so appended
+    history only needs its own rows summarized.
+    """
+    n: np.ndarray           # int64[12] non-NaN gen hours
+    mean: np.ndarray        # float64[12] (0 where n == 0)
+    var: np.ndarray         # float64[12] sample variance, ddof=1 (0 where n < 2)
+    rows: np.ndarray        # int64[12] history hours, NaN gen included
+    period_mwh: np.ndarray  # float64[12, 2] gen totals, column 0=Peak, 1=Off-Peak
+
+    @classmethod
+    def stacked(cls, group, n_groups: int, month0, per, gen):
+        """
+        One GenStats per group id over stacked hourly columns (0-based month,
+        period 0=Peak). Uses pandas' grouped reductions once over all groups, so
+        each group's moments are bit-identical to a per-frame groupby.
+        """
+        k = group*12 + month0
+        size = n_groups*12
+        full = lambda r, m, fill: r.reindex(range(m), fill_value=fill).to_numpy()
+        by = pd.Series(gen).groupby(k)
+        n = full(by.count(), size, 0).astype(np.int64)
+        mean = np.nan_to_num(full(by.mean(), size, 0.0))
+        var = np.nan_to_num(full(by.var(), size, 0.0))
+        rows = np.bincount(k, minlength=size)
+        pm = full(pd.Series(gen).groupby(k*2 + per).sum(), size*2, 0.0).reshape(-1, 2)
+        sl = lambda a, i: a[i*12:(i+1)*12]
+        return [cls(sl(n, i), sl(mean, i), sl(var, i), sl(rows, i), sl(pm, i)) for i in range(n_groups)]
+
+    @classmethod
+    def from_frame(cls, hdf: pd.DataFrame):
+        return cls.stacked(np.zeros(len(hdf), dtype=np.int64), 1, hdf.index.month.to_numpy() - 1,
+                           np.where(hdf["is_peak"].to_numpy(), 0, 1), hdf["Gen"].to_numpy(dtype=float))[0]
+
+    def merge(self, other: "GenStats"):
+        """Stats of both histories (Chan et al. pairwise moment update)."""
+        m2 = lambda g: g.var * np.maximum(g.n - 1, 0)
+        n = self.n + other.n
+        w = np.divide(other.n, n, out=np.zeros(12), where=n>0)
+        d = other.mean - self.mean
+        var = np.divide(m2(self) + m2(other) + d*d*self.n*w, n - 1, out=np.zeros(12), where=n>1)
+        return GenStats(n, self.mean + d*w, var, self.rows + other.rows, self.period_mwh + other.period_mwh)
+
+    def forecast(self):
+        """Monthly expected gen and peak/off shares over the forecast window."""
+        hours_map = month_hours_map()
+        seen = self.rows > 0
+        hourly_mean = np.where(seen, np.where(self.n > 0, self.mean, np.nan), 0.0)
+        hourly_std = np.sqrt(np.where(self.n > 1, self.var, 0.0))
+        total = self.period_mwh.sum(axis=1)
+        total = np.where(total == 0, 1, total)
+        peak_pcts = np.where(seen, self.period_mwh[:, 0] / total, 0.5)
+        off_pcts = np.where(seen, self.period_mwh[:, 1] / total, 0.5)
+
+        rows = []
+        for y in range(CFG.FORECAST_START_YEAR, CFG.FORECAST_START_YEAR+CFG.FORECAST_YEARS):
+            for m in range(1,13):
+                hm = hours_map[m]
+                exp_mwh = float(hourly_mean[m-1] * hm)
+                std_mwh = float(hourly_std[m-1] * (hm**0.5))
+                peak_pct = float(peak_pcts[m-1])
+                off_pct  = float(off_pcts[m-1])
+                rows.append({
+                    "year":y,"month":m,
+                    "expected_mwh":max(exp_mwh,0.0),
+                    "std_mwh":max(std_mwh,0.0),
+                    "peak_mwh":max(exp_mwh*peak_pct,0.0),
+                    "off_mwh":max(exp_mwh*off_pct,0.0),
+                    "peak_pct":peak_pct,"off_pct":off_pct
+                })
+        return pd.DataFrame(rows)
+
 def forecast_generation(hdf: pd.DataFrame):
     """Monthly expected gen and peak/off shares from history."""
-    hdf = hdf.copy()
-    hdf["month"] = hdf.index.month
-    hours_map = month_hours_map()
-
-    hourly_mean = hdf.groupby("month")["Gen"].mean()
-    hourly_std  = hdf.groupby("month")["Gen"].std().fillna(0)
-
-    ptab = hdf.groupby(["month","period"])["Gen"].sum().unstack(fill_value=0)
-    ptab["total"] = ptab.sum(axis=1)
-    ptab["peak_pct"] = ptab.get("Peak",0) / ptab["total"].replace(0,1)
-    ptab["off_pct"]  = ptab.get("Off-Peak",0) / ptab["total"].replace(0,1)
-
-    rows = []
-    for y in range(CFG.FORECAST_START_YEAR, CFG.FORECAST_START_YEAR+CFG.FORECAST_YEARS):
-        for m in range(1,13):
-            hm = hours_map[m]
-            exp_mwh = float(hourly_mean.get(m,0.0) * hm)
-            std_mwh = float(hourly_std.get(m,0.0) * (hm**0.5))
-            peak_pct = float(ptab.loc[m,"peak_pct"]) if m in ptab.index else 0.5
-            off_pct  = float(ptab.loc[m,"off_pct"])  if m in ptab.index else 0.5
-            rows.append({
-                "year":y,"month":m,
-                "expected_mwh":max(exp_mwh,0.0),
-                "std_mwh":max(std_mwh,0.0),
-                "peak_mwh":max(exp_mwh*peak_pct,0.0),
-                "off_mwh":max(exp_mwh*off_pct,0.0),
-                "peak_pct":peak_pct,"off_pct":off_pct
-            })
-    return pd.DataFrame(rows)
+    return GenStats.from_frame(hdf).forecast()
 
 def forecast_hub_forwards(fw_df: pd.DataFrame, market: str):
     """Return monthly hub forward peak/off for forecast window."""
@@ -42,3 +92,43 @@ def forecast_hub_forwards(fw_df: pd.DataFrame, market: str):
     df["month"] = df["date"].dt.month
     df = df[(df["year"]>=CFG.FORECAST_START_YEAR)&(df["year"]<CFG.FORECAST_START_YEAR+CFG.FORECAST_YEARS)]
     return df[["year","month","Peak","Off_Peak"]].rename(columns={"Peak":"fw_peak","Off_Peak":"fw_off"})
+
+@dataclass
+class TermSheet:
+    """
+    Forecast window joined once per asset: one row per (year, month) with gen
+    expectations, hub forwards and the matching history-bucket means, so the
+    simulator, component breakdown and DCF read aligned columns instead of
+    filtering `fw` per row. `missing_fw` lists (year, month) with no forward
+    (priced at 0.0, as before, but now reported).
+    """
+    table: pd.DataFrame
+    missing_fw: list
+
+    def col(self, name):
+        return self.table[name].to_numpy()
+
+    def pair(self, stem):
+        """(T, 2) array of `<stem>_peak`, `<stem>_off` (column 0=Peak, 1=Off-Peak)."""
+        return np.column_stack([self.col(f"{stem}_peak"), self.col(f"{stem}_off")])
+
+def build_term_sheet(gen_fc: pd.DataFrame, fw: pd.DataFrame, buckets: BucketStore):
+    t = gen_fc[["year","month","expected_mwh","std_mwh","peak_mwh","off_mwh","peak_pct","off_pct"]]
+    fwu = fw[["year","month","fw_peak","fw_off"]].drop_duplicates(["year","month"])
+    t = t.merge(fwu, on=["year","month"], how="left", indicator=True)
+    t["has_fw"] = t.pop("_merge").eq("both")
+    t["fw_peak"] = t["fw_peak"].where(t["has_fw"], 0.0)
+    t["fw_off"] = t["fw_off"].where(t["has_fw"], 0.0)
+    t["mwh_std_peak"] = t["std_mwh"] * t["peak_pct"]
+    t["mwh_std_off"] = t["std_mwh"] * t["off_pct"]
+
+    months = t["month"].to_numpy()
+    for j, sfx in enumerate(("peak", "off")):
+        t[f"covered_{sfx}"] = buckets.has(months, j)
+        for f in ("rt_hub", "da_hub"):
+            t[f"{f}_mean_{sfx}"] = buckets.mean(f, months, j)
+        for f in ("rt_basis", "da_basis"):   # 0.0 where the bucket is missing/empty
+            t[f"{f}_mean_{sfx}"] = np.nan_to_num(buckets.mean(f, months, j), nan=0.0)
+    t = t.rename(columns={"peak_mwh": "mwh_peak", "off_mwh": "mwh_off"})
+    missing = [(int(y), int(m)) for y, m in t.loc[~t["has_fw"], ["year","month"]].itertuples(index=False)]
+    return TermSheet(t, missing)
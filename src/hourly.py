@@ -0,0 +1,144 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from .config import CFG
+from .data_loader import load_asset, source_keys, _asset_csv_path
+from .utils import umask_mode
+
+FIELDS = ("gen", "rt_resid", "da_resid", "rt_basis", "da_basis")
+HOURLY_VERSION = 1
+
+def _is_peak(index: pd.DatetimeIndex):
+    return np.isin(index.dayofweek, CFG.PEAK_DAYS) & np.isin(index.hour, CFG.PEAK_HOURS)
+
+class HourlyHistory:
+    """
+    Day-aligned joint hourly history for block bootstrapping: gen, hub residuals
+    (hub minus its (month, period) mean, so a block can be shifted onto any
+    forward) and raw basis, 24 rows per history day, plus each day's weekday
+    and day-of-year. Missing hours carry gen 0 (never settled) and basis 0.
+    Opened from disk, the arrays are read-only memory maps shared by every
+    process through the page cache.
+    """
+    def __init__(self, arrays: dict, dow: np.ndarray, doy: np.ndarray):
+        self.arrays, self.dow, self.doy = arrays, dow, doy
+
+    @property
+    def n_days(self):
+        return len(self.dow)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame):
+        """From a data_loader asset frame; the index is regularized to whole days of hours."""
+        df = df[~df.index.duplicated()]
+        days = pd.date_range(df.index.min().normalize(), df.index.max().normalize(), freq="D")
+        full = pd.date_range(days[0], periods=len(days) * 24, freq="h")
+        h = df.reindex(full)
+        month, per = full.month.to_numpy() - 1, np.where(_is_peak(full), 0, 1)
+        gen = h["Gen"].to_numpy(dtype=float)
+        ok = ~np.isnan(gen)
+        arrays = {}
+        for mk in ("rt", "da"):
+            hub = h[f"{mk.upper()}_Hub"].to_numpy(dtype=float)
+            fin = ~np.isnan(hub)
+            code = month * 2 + per
+            tot = np.bincount(code[fin], weights=hub[fin], minlength=24)
+            n = np.bincount(code[fin], minlength=24)
+            mean = np.divide(tot, n, out=np.zeros(24), where=n > 0)
+            arrays[f"{mk}_resid"] = np.where(fin, hub - mean[code], 0.0)
+            arrays[f"{mk}_basis"] = np.nan_to_num(h[f"{mk.upper()}_Basis"].to_numpy(dtype=float))
+            ok &= fin
+        arrays["gen"] = np.where(ok, np.nan_to_num(gen), 0.0)
+        return cls(arrays, days.dayofweek.to_numpy(), days.dayofyear.to_numpy())
+
+    def save(self, path: str):
+        """One .npy per array under `path` (written to a temp dir and renamed into place)."""
+        parent = os.path.dirname(path.rstrip("/")) or "."
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+        os.chmod(tmp, umask_mode(0o777))          # mkdtemp creates 0700
+        for name, a in {**self.arrays, "dow": self.dow, "doy": self.doy}.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(a))
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"version": HOURLY_VERSION, "days": self.n_days}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.replace(tmp, path)
+        except OSError:                               # another writer got there first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @classmethod
+    def open(cls, path: str):
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        return cls({f: load(f) for f in FIELDS}, np.asarray(load("dow")), np.asarray(load("doy")))
+
+    def plan(self, block_days: int = None, window_days: int = None):
+        """Forecast-horizon layout and bootstrap candidates (see HourlyPlan)."""
+        return HourlyPlan(self, block_days or CFG.HOURLY_BLOCK_DAYS, window_days or CFG.HOURLY_WINDOW_DAYS)
+
+class HourlyPlan:
+    """
+    The forecast window as H hours in blocks of `block_days` days. Each block
+    may be filled by any history block that starts on the same weekday within
+    `window_days` of the same day-of-year (so peak hours, weekends and season
+    line up), falling back to any same-weekday start if that leaves none.
+    month_idx maps every hour to its term-sheet row and period to 0=Peak, 1=Off-Peak.
+    """
+    def __init__(self, hist: HourlyHistory, block_days: int, window_days: int):
+        start = pd.Timestamp(f"{CFG.FORECAST_START_YEAR}-01-01")
+        hours = pd.date_range(start, start + pd.DateOffset(years=CFG.FORECAST_YEARS), freq="h", inclusive="left")
+        days = pd.date_range(start, hours[-1].normalize(), freq="D")
+        self.n_hours = len(hours)
+        self.month_idx = (hours.year.to_numpy() - CFG.FORECAST_START_YEAR) * 12 + hours.month.to_numpy() - 1
+        self.period = np.where(_is_peak(hours), 0, 1)
+
+        first = np.arange(0, len(days), block_days)
+        lens = np.minimum(block_days, len(days) - first)
+        day_block = np.repeat(np.arange(len(first)), lens)
+        self.block_of_hour = np.repeat(day_block, 24)
+        self.offset = np.arange(self.n_hours) - np.repeat(first * 24, lens * 24)
+
+        cands = []
+        for d0, ln in zip(first, lens):
+            fits = np.arange(hist.n_days) <= hist.n_days - ln
+            same = fits & (hist.dow == days[d0].dayofweek)
+            dist = np.abs(hist.doy - days[d0].dayofyear)
+            near = same & (np.minimum(dist, 366 - dist) <= window_days)
+            c = np.flatnonzero(near if near.any() else same if same.any() else fits)
+            if not len(c):
+                raise ValueError(f"History of {hist.n_days} days is shorter than one {ln}-day block")
+            cands.append(c)
+        self.n_cand = np.array([len(c) for c in cands])
+        self.cand = np.zeros((len(cands), self.n_cand.max()), dtype=np.int64)
+        for i, c in enumerate(cands):
+            self.cand[i, :len(c)] = c
+
+    def sample_hours(self, rng, n: int):
+        """(n, H) history row index per path and forecast hour: one block start draw per (path, block)."""
+        pick = (rng.random((n, len(self.n_cand))) * self.n_cand).astype(np.int64)
+        starts = self.cand[np.arange(len(self.n_cand)), pick] * 24
+        return starts[:, self.block_of_hour] + self.offset
+
+def hourly_dirs(frames: dict = None, assets=None, use_cache: bool = None):
+    """
+    {asset: directory} of each asset's HourlyHistory under PROC_DIR/hourly/,
+    keyed by the raw file's content hash; built (from `frames`, or loaded via
+    data_loader with `use_cache` for the frame cache) only when missing.
+    """
+    keys = source_keys()
+    out = {}
+    for asset in assets or CFG.ASSETS:
+        path = os.path.join(CFG.PROC_DIR, "hourly", f"{asset}-{keys[asset]}-v{HOURLY_VERSION}")
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            df = (frames[asset] if frames and asset in frames
+                  else load_asset(_asset_csv_path(asset, CFG.ASSETS[asset]), use_cache))
+            HourlyHistory.from_frame(df).save(path)
+            root = os.path.dirname(path)
+            for d in os.listdir(root):                # drop stale versions of this asset's history
+                if d.startswith(f"{asset}-") and d != os.path.basename(path):
+                    shutil.rmtree(os.path.join(root, d), ignore_errors=True)
+        out[asset] = path
+    return out
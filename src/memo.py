@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from .config import CFG
+from .utils import umask_mode
+
+def stage_key(stage: str, *parts):
+    """Hash of a stage name, its upstream stage keys and the parameters/config values it reads."""
+    h = hashlib.sha256(stage.encode())
+    h.update(json.dumps(parts, default=str, sort_keys=True).encode())
+    return h.hexdigest()[:20]
+
+_CODE_VERSION = []
+
+def code_version():
+    """Hash of this package's source files, so edited stage code does not reuse old pickles."""
+    if not _CODE_VERSION:
+        h = hashlib.sha256()
+        root = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(root)):
+            if name.endswith(".py"):
+                with open(os.path.join(root, name), "rb") as f:
+                    h.update(name.encode() + f.read())
+        _CODE_VERSION.append(h.hexdigest()[:8])
+    return _CODE_VERSION[0]
+
+def config_parts(*fields):
+    """{field: CFG value} for the Config fields a stage depends on."""
+    return {f: getattr(CFG, f) for f in fields}
+
+class StageCache:
+    """
+    Pickled stage results under root/<stage>-<key>-<version>.pkl, version
+    defaulting to code_version(). A hit refreshes the entry's mtime; after each
+    write, least-recently-used entries are evicted until the directory is
+    within max_mb (entries of other versions are never hit, so they age out).
+    """
+    def __init__(self, root: str = None, max_mb: float = None, enabled: bool = True, version: str = None):
+        self.root = root or CFG.MEMO_DIR
+        self.version = version or code_version()
+        self.max_bytes = (CFG.MEMO_MAX_MB if max_mb is None else max_mb) * 2**20
+        self.enabled = enabled
+        self.hits, self.misses = [], []
+
+    def _path(self, stage, key):
+        return os.path.join(self.root, f"{stage}-{key}-{self.version}.pkl")
+
+    def has(self, stage: str, key: str):
+        return self.enabled and os.path.exists(self._path(stage, key))
+
+    def get(self, stage: str, key: str, compute):
+        """Cached compute() for (stage, key); computes and stores on a miss."""
+        if not self.enabled:
+            return compute()
+        path = self._path(stage, key)
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    out = pickle.load(f)
+                os.utime(path)
+                self.hits.append(stage)
+                return out
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass                                  # corrupt entry: recompute below
+        out = compute()
+        self.misses.append(stage)
+        self._store(path, out)
+        return out
+
+    def _store(self, path, value):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.chmod(tmp, umask_mode())
+        os.replace(tmp, path)
+        self.evict(keep=path)
+
+    def evict(self, keep: str = None):
+        """Drop least-recently-used entries until total size <= max_bytes (never `keep`)."""
+        entries = []
+        for name in os.listdir(self.root):
+            p = os.path.join(self.root, name)
+            if name.endswith(".pkl"):
+                st = os.stat(p)
+                entries.append((st.st_mtime, st.st_size, p))
+        total = sum(e[1] for e in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes: break
+            if p == keep: continue
+            os.remove(p)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
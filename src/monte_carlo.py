@@ -1,11 +1,16 @@
 import numpy as np
-import pandas as pd
 from .config import CFG
+from .analysis import BucketStore, PERIODS
+from .forecasting import TermSheet
+from .hourly import HourlyHistory
+from .sketch import QuantileSketch
 from .utils import safe_div
+from . import profiling
+from .valuation import discount_matrix, p_level_ci
 
-def _bootstrap_series(s: pd.Series, rng):
+def _bootstrap_series(s: np.ndarray, rng):
     if s is None or len(s)==0: return 0.0
-    return float(s.iloc[rng.integers(0, len(s))])
+    return float(s[rng.integers(0, len(s))])
 
 def _regime_hub_draw(bkt: dict, p_high: float, is_rt: bool, rng):
     if is_rt:
@@ -16,45 +21,28 @@ def _regime_hub_draw(bkt: dict, p_high: float, is_rt: bool, rng):
         return _bootstrap_series(bkt["rt_hub"], rng)
     return _bootstrap_series(bkt["da_hub"], rng)
 
-def _basis_draw_stressed(basis_series: pd.Series, hub_price: float, alpha: float, rng):
+def _basis_draw_stressed(basis_series: np.ndarray, hub_price: float, alpha: float, rng):
     if basis_series is None or len(basis_series)==0: return 0.0
     b = _bootstrap_series(basis_series, rng)
     csf = safe_div(abs(b), max(abs(hub_price), 1e-6))  # congestion stress factor
     return float(b * (1.0 + alpha * csf))
 
-def simulate_merchant_price_per_mwh(
-    buckets: dict,
-    gen_forecast: pd.DataFrame,
-    fw: pd.DataFrame,
-    product: str,
-    p_high: float,
-    negative_rule: bool,
-    seed: int,
-    n_sims: int
-):
-    """
-    product ∈ {'RT_HUB','RT_BUS','DA_HUB','DA_BUS'}
-    Returns np.array of merchant $/MWh across sims.
-    """
-    rng = np.random.default_rng(seed)
+def _simulate_loop(buckets, term: TermSheet, product, p_high, negative_rule, rng, n_sims):
+    """Reference engine: one scalar draw at a time (slow, kept for cross-checks)."""
     out = np.zeros(n_sims, dtype=float)
+    months = term.col("month")
+    mu, sd, fwp = term.pair("mwh"), term.pair("mwh_std"), term.pair("fw")
 
     for s in range(n_sims):
         tot_rev = 0.0
         tot_gen = 0.0
-        for _, r in gen_forecast.iterrows():
-            key_peak = (int(r["month"]), "Peak")
-            key_off  = (int(r["month"]), "Off-Peak")
-            fw_row = fw[(fw["year"]==r["year"])&(fw["month"]==r["month"])]
-            fw_peak = float(fw_row["fw_peak"].iloc[0]) if not fw_row.empty else 0.0
-            fw_off  = float(fw_row["fw_off"].iloc[0])  if not fw_row.empty else 0.0
+        for i in range(len(months)):
+            peak_mwh = max(rng.normal(mu[i, 0], sd[i, 0]), 0.0)
+            off_mwh  = max(rng.normal(mu[i, 1], sd[i, 1]), 0.0)
 
-            peak_mwh = max(rng.normal(r["peak_mwh"], r["std_mwh"]*r["peak_pct"]), 0.0)
-            off_mwh  = max(rng.normal(r["off_mwh"],  r["std_mwh"]*r["off_pct"]),  0.0)
-
-            for per, mwh, fw_price in [("Peak", peak_mwh, fw_peak), ("Off-Peak", off_mwh, fw_off)]:
+            for per, mwh, fw_price in [("Peak", peak_mwh, fwp[i, 0]), ("Off-Peak", off_mwh, fwp[i, 1])]:
                 if mwh <= 0: continue
-                bkt = buckets.get((int(r["month"]), per))
+                bkt = buckets.get((int(months[i]), per))
                 if bkt is None: continue
                 is_rt = product.startswith("RT")
 
@@ -76,3 +64,314 @@ def simulate_merchant_price_per_mwh(
 
         out[s] = tot_rev / tot_gen if tot_gen > 0 else 0.0
     return out
+
+def _iter_loop(buckets, term, product, p_high, negative_rule, rng, n_sims, block, **_):
+    for start in range(0, n_sims, block):
+        n = min(block, n_sims - start)
+        profiling.count("sims", n)
+        yield _simulate_loop(buckets, term, product, p_high, negative_rule, rng, n)
+
+class _Cells:
+    """(T, 2) month/period cell tables shared by every block: bucket indices, coverage, hub means, regime counts."""
+    def __init__(self, buckets: BucketStore, term: TermSheet, markets):
+        self.mu, self.sd, self.fwp = term.pair("mwh"), term.pair("mwh_std"), term.pair("fw")
+        self.has_fw = term.col("has_fw")[:, None]
+        self.M = np.broadcast_to(term.col("month")[:, None], self.mu.shape)
+        self.P = np.broadcast_to(np.arange(len(PERIODS)), self.mu.shape)
+        self.covered = term.pair("covered")
+        self.hub_mean = {mk: term.pair(f"{mk.lower()}_hub_mean") for mk in markets}
+        self.n_low = buckets.count("rt_hub", self.M, self.P, "LOW")
+        self.n_high = buckets.count("rt_hub", self.M, self.P, "HIGH")
+
+def _draw_gen(c: _Cells, rng, n, antithetic=False):
+    """(n, T, 2) generation MWh, zeroed in cells without history (effective gen before the negative rule)."""
+    if antithetic:
+        z = rng.standard_normal(((n + 1) // 2,) + c.mu.shape)
+        mwh = np.maximum(c.mu + c.sd * np.concatenate([z, -z])[:n], 0.0)
+    else:
+        mwh = np.maximum(rng.normal(c.mu, c.sd, size=(n,) + c.mu.shape), 0.0)
+    return np.where(c.covered, mwh, 0.0)
+
+def _draw_hub(buckets: BucketStore, c: _Cells, markets, p_high, rng, n, stratify=False):
+    """{mk: (n, T, 2) hub draws}: RT with the HIGH/LOW regime mix, then DA."""
+    size = (n,) + c.mu.shape
+    hub = {}
+    if "RT" in markets:
+        h = buckets.sample("rt_hub", c.M, c.P, rng, size, regime="LOW")
+        if (c.n_low==0).any():
+            h = np.where(c.n_low>0, h, buckets.sample("rt_hub", c.M, c.P, rng, size))
+        if stratify:
+            strata = rng.permuted(np.broadcast_to(np.arange(n, dtype=float)[:, None, None], size), axis=0)
+            u = (strata + rng.random(size)) / n
+        else:
+            u = rng.random(size)
+        use_high = (u < p_high) & (c.n_high>0)
+        hub["RT"] = np.where(use_high, buckets.sample("rt_hub", c.M, c.P, rng, size, regime="HIGH"), h)
+    if "DA" in markets:
+        hub["DA"] = buckets.sample("da_hub", c.M, c.P, rng, size)
+    return hub
+
+def _draw_basis(buckets: BucketStore, c: _Cells, basis_markets, rng, n):
+    return {mk: buckets.sample(f"{mk.lower()}_basis", c.M, c.P, rng, (n,) + c.mu.shape) for mk in basis_markets}
+
+def _draw_block(buckets: BucketStore, c: _Cells, markets, basis_markets, p_high, rng, n,
+                antithetic=False, stratify=False):
+    """
+    One (n, T, 2) block of raw draws in the fixed order gen, RT hub, DA hub,
+    RT basis, DA basis (skipping markets not requested).
+    Returns (effective gen before the negative rule, {mk: hub}, {mk: raw basis}).
+    """
+    eff0 = _draw_gen(c, rng, n, antithetic)
+    hub = _draw_hub(buckets, c, markets, p_high, rng, n, stratify)
+    return eff0, hub, _draw_basis(buckets, c, basis_markets, rng, n)
+
+def _node_price(product, c: _Cells, hub, basis, alpha, fw_shift=0.0):
+    """
+    Simulated node $/MWh per cell: forward (+ shift, only where a forward exists)
+    + hub residual (+ stressed basis for BUS).
+    """
+    mk = product[:2]
+    fwp = c.fwp + np.where(c.has_fw, fw_shift, 0.0) if fw_shift else c.fwp
+    node = fwp + (hub[mk] - c.hub_mean[mk])
+    if product.endswith("BUS"):
+        b = basis[mk]
+        csf = np.abs(b) / np.maximum(np.abs(node), 1e-6)  # congestion stress factor
+        node = node + b * (1.0 + alpha * csf)
+    return np.where(c.covered, node, 0.0)
+
+def _settle(node, eff0, neg, disc=None):
+    """Gen-weighted $/MWh per path, and per-path revenue NPVs (revenue @ disc) if disc is given."""
+    eff = np.where(node < 0, 0.0, eff0) if neg else eff0
+    tot_rev = (eff * node).sum(axis=(1, 2))
+    tot_gen = eff.sum(axis=(1, 2))
+    price = np.divide(tot_rev, tot_gen, out=np.zeros(len(node)), where=tot_gen > 0)
+    return price, (None if disc is None else (eff * node).sum(axis=2) @ disc)
+
+def _iter_joint(buckets: BucketStore, term: TermSheet, products, p_high, neg_rules, rng, n_sims, block,
+                disc: np.ndarray = None, antithetic: bool = False, stratify: bool = False):
+    """
+    Batch engine with common random numbers: each (sims, months, periods) block
+    draws gen, RT/DA hub and RT/DA basis once and derives every requested
+    product and negative-rule variant from them.
+    Yields ({(product, neg): price block}, {(product, neg): npv block}); the NPV
+    dict is filled only when `disc` (months x rates discount matrix) is given,
+    as per-path monthly revenue @ disc -> (sims, rates).
+    Draws are made in a fixed order (gen, RT hub, DA hub, RT basis, DA basis),
+    skipping any not needed, so a single product reproduces its own stream.
+    Variance reduction: `antithetic` pairs each generation normal z with -z
+    within a block; `stratify` draws the RT regime uniform per bucket cell from
+    n equal strata (Latin hypercube), so each cell sees HIGH in ~n*p_high sims.
+    """
+    markets = [mk for mk in ("RT", "DA") if any(p.startswith(mk) for p in products)]
+    basis_markets = [mk for mk in markets if f"{mk}_BUS" in products]
+    cells = _Cells(buckets, term, markets)
+
+    for start in range(0, n_sims, block):
+        n = min(block, n_sims - start)
+        profiling.count("sims", n)
+        eff0, hub, basis = _draw_block(buckets, cells, markets, basis_markets, p_high, rng, n,
+                                       antithetic, stratify)
+        out, npv = {}, {}
+        for product in products:
+            node = _node_price(product, cells, hub, basis, CFG.BASIS_STRESS_ALPHA)
+            for neg in neg_rules:
+                out[(product, neg)], v = _settle(node, eff0, neg, disc)
+                if disc is not None:
+                    npv[(product, neg)] = v
+        yield out, npv
+
+class _HourlyCells:
+    """_Cells counterpart over (H, 1) forecast hours: forward and coverage per hour; residuals need no mean."""
+    def __init__(self, term: TermSheet, plan):
+        rows, per = plan.month_idx, plan.period
+        self.fwp = term.pair("fw")[rows, per][:, None]
+        self.has_fw = term.col("has_fw")[rows][:, None]
+        self.covered = term.pair("covered")[rows, per][:, None]
+        self.hub_mean = {"RT": 0.0, "DA": 0.0}
+        self.rows = rows
+
+def _iter_hourly(hist: HourlyHistory, term: TermSheet, products, neg_rules, rng, n_sims, block,
+                 disc: np.ndarray = None, **_):
+    """
+    Hourly engine: each path strings together contiguous history blocks of
+    joint (gen, hub residual, basis) hours (HourlyHistory.plan), shifts the hub
+    onto the monthly Peak/Off-Peak forward and settles every hour, so capture
+    discounts and the negative-price rule see the hour-level gen/price
+    co-movement. Draws are (block, H, 1) so _node_price/_settle apply as in the
+    monthly engine; `block` bounds memory (~10 float arrays of block x H).
+    Same yields as _iter_joint; antithetic/stratify do not apply.
+    """
+    plan = hist.plan()
+    cells = _HourlyCells(term, plan)
+    disc_h = None if disc is None else disc[cells.rows]     # each hour discounted at its month's factor
+    markets = {p[:2] for p in products}
+    for start in range(0, n_sims, block):
+        n = min(block, n_sims - start)
+        profiling.count("sims", n)
+        idx = plan.sample_hours(rng, n)
+        eff0 = np.where(cells.covered, hist.arrays["gen"][idx][..., None], 0.0)
+        hub = {mk: hist.arrays[f"{mk.lower()}_resid"][idx][..., None] for mk in markets}
+        basis = {mk: hist.arrays[f"{mk.lower()}_basis"][idx][..., None] for mk in markets
+                 if f"{mk}_BUS" in products}
+        del idx
+        out, npv = {}, {}
+        for product in products:
+            node = _node_price(product, cells, hub, basis, CFG.BASIS_STRESS_ALPHA)
+            for neg in neg_rules:
+                out[(product, neg)], v = _settle(node, eff0, neg, disc_h)
+                if disc is not None:
+                    npv[(product, neg)] = v
+        yield out, npv
+
+def _iter_vectorized(buckets: BucketStore, term: TermSheet, product, p_high, negative_rule, rng, n_sims, block,
+                     **kw):
+    """Batch engine for one product: the joint engine restricted to that product."""
+    for blk, _ in _iter_joint(buckets, term, [product], p_high, [negative_rule], rng, n_sims, block, **kw):
+        yield blk[(product, negative_rule)]
+
+ENGINES = {"vectorized": _iter_vectorized, "loop": _iter_loop}
+
+def _variance_kw(antithetic, stratify):
+    return dict(antithetic=CFG.SIM_ANTITHETIC if antithetic is None else antithetic,
+                stratify=CFG.SIM_STRATIFY if stratify is None else stratify)
+
+def _converged(acc: dict, p_level: int, tolerance: float):
+    """True once every key's P-level CI (arrays: list of blocks, or a sketch) is within `tolerance`."""
+    for v in acc.values():
+        sims = v if isinstance(v, QuantileSketch) else np.concatenate(v)
+        lo, hi = p_level_ci(sims, p_level)
+        if not hi - lo <= tolerance: return False
+    return True
+
+def iter_merchant_price_blocks(
+    buckets: BucketStore,
+    term: TermSheet,
+    product: str,
+    p_high: float,
+    negative_rule: bool,
+    seed,
+    n_sims: int,
+    engine: str = None,
+    block: int = None,
+    antithetic: bool = None,
+    stratify: bool = None
+):
+    """
+    Yield merchant $/MWh for `n_sims` sims in blocks of at most `block`
+    (default CFG.SIM_BLOCK_SIZE). Concatenated, the blocks equal
+    simulate_merchant_price_per_mwh() for the same arguments.
+    antithetic/stratify (default CFG.SIM_ANTITHETIC/SIM_STRATIFY) apply to the
+    vectorized engine; the loop reference ignores them.
+    """
+    engine = engine or CFG.SIM_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}; expected one of {sorted(ENGINES)}")
+    rng = np.random.default_rng(seed)
+    return ENGINES[engine](buckets, term, product, p_high, negative_rule, rng, n_sims, block or CFG.SIM_BLOCK_SIZE,
+                           **_variance_kw(antithetic, stratify))
+
+def simulate_merchant_price_per_mwh(
+    buckets: BucketStore,
+    term: TermSheet,
+    product: str,
+    p_high: float,
+    negative_rule: bool,
+    seed,
+    n_sims: int,
+    engine: str = None,
+    tolerance: float = None,
+    p_level: int = None,
+    antithetic: bool = None,
+    stratify: bool = None
+):
+    """
+    product ∈ {'RT_HUB','RT_BUS','DA_HUB','DA_BUS'}
+    engine ∈ {'vectorized','loop'}; defaults to CFG.SIM_ENGINE. 'loop' is the scalar reference.
+    seed: int or np.random.SeedSequence.
+    tolerance: adaptive mode (default CFG.SIM_TOLERANCE). Sims run in CFG.SIM_BATCH
+    batches until the CI on the `p_level` price is at most `tolerance` $/MWh
+    wide, with n_sims as the cap; the result is a prefix of the fixed-size run
+    at block=SIM_BATCH.
+    Returns np.array of merchant $/MWh across sims.
+    """
+    tolerance = CFG.SIM_TOLERANCE if tolerance is None else tolerance
+    block = CFG.SIM_BATCH if tolerance else None
+    blocks = []
+    for blk in iter_merchant_price_blocks(buckets, term, product, p_high, negative_rule, seed, n_sims, engine,
+                                          block, antithetic, stratify):
+        blocks.append(blk)
+        if tolerance and _converged({0: blocks}, p_level or CFG.P_LEVEL, tolerance): break
+    return np.concatenate(blocks) if blocks else np.zeros(0)
+
+def summarize_merchant_price(buckets, term, product, p_high, negative_rule, seed, n_sims,
+                             engine: str = None, sketch: QuantileSketch = None, tolerance: float = None,
+                             p_level: int = None, antithetic: bool = None, stratify: bool = None):
+    """
+    Streaming mode: fold every block into a QuantileSketch (memory constant in n_sims).
+    tolerance/p_level as for simulate_merchant_price_per_mwh.
+    """
+    sketch = sketch or QuantileSketch()
+    tolerance = CFG.SIM_TOLERANCE if tolerance is None else tolerance
+    block = CFG.SIM_BATCH if tolerance else None
+    for blk in iter_merchant_price_blocks(buckets, term, product, p_high, negative_rule, seed, n_sims, engine,
+                                          block, antithetic, stratify):
+        sketch.update(blk)
+        if tolerance and _converged({0: sketch}, p_level or CFG.P_LEVEL, tolerance): break
+    return sketch
+
+def simulate_joint_paths(buckets: BucketStore, term: TermSheet, products, p_high: float, neg_rules, seed,
+                         n_sims: int, waccs=(), stream: bool = False, block: int = None,
+                         tolerance: float = None, p_level: int = None, antithetic: bool = None,
+                         stratify: bool = None, hourly: HourlyHistory = None):
+    """
+    Common-random-numbers simulation of several products and negative-rule
+    variants from one set of draws (vectorized engine only), plus the per-path
+    merchant revenue NPV at each rate in `waccs` (one matrix product per block).
+    Returns (prices, npvs): prices is {(product, negative_rule): sim array},
+    npvs is {(product, negative_rule): (n_sims, len(waccs)) array}; with
+    stream=True both hold QuantileSketches (one per rate for npvs).
+    With a tolerance, convergence of every variant's P-level CI is checked after
+    each CFG.SIM_BATCH sims.
+    With `hourly` (an HourlyHistory), paths come from the hourly block-bootstrap
+    engine instead, in blocks of at most CFG.HOURLY_BLOCK_SIMS (also when adaptive).
+    """
+    tolerance = CFG.SIM_TOLERANCE if tolerance is None else tolerance
+    step = CFG.SIM_BATCH if tolerance else None
+    rng = np.random.default_rng(seed)
+    keys = [(p, neg) for p in products for neg in neg_rules]
+    disc = discount_matrix(len(term.table), list(waccs)) if len(waccs) else None
+    acc = {k: QuantileSketch() if stream else [] for k in keys}
+    npv_acc = {k: [QuantileSketch() for _ in waccs] if stream else [] for k in keys} if len(waccs) else {}
+    if hourly is not None:
+        blocks = _iter_hourly(hourly, term, list(products), list(neg_rules), rng, n_sims,
+                              min(block or CFG.HOURLY_BLOCK_SIMS, CFG.HOURLY_BLOCK_SIMS), disc)
+    else:
+        blocks = _iter_joint(buckets, term, list(products), p_high, list(neg_rules), rng,
+                             n_sims, step or block or CFG.SIM_BLOCK_SIZE, disc, **_variance_kw(antithetic, stratify))
+    done, check_at = 0, step
+    for blk, npv in blocks:
+        for k in keys:
+            if stream: acc[k].update(blk[k])
+            else: acc[k].append(blk[k])
+            if k in npv_acc:
+                if stream:
+                    for sk, col in zip(npv_acc[k], npv[k].T): sk.update(col)
+                else: npv_acc[k].append(npv[k])
+        done += len(blk[keys[0]])
+        if tolerance and done >= check_at:
+            if _converged(acc, p_level or CFG.P_LEVEL, tolerance): break
+            check_at += step
+    if stream: return acc, npv_acc
+    return ({k: np.concatenate(v) if v else np.zeros(0) for k, v in acc.items()},
+            {k: np.concatenate(v) if v else np.zeros((0, len(waccs))) for k, v in npv_acc.items()})
+
+def simulate_joint(buckets: BucketStore, term: TermSheet, products, p_high: float, neg_rules, seed,
+                   n_sims: int, stream: bool = False, block: int = None, **kw):
+    """
+    Common-random-numbers simulation of several products and negative-rule
+    variants from one set of draws (vectorized engine only).
+    Returns {(product, negative_rule): sim array, or QuantileSketch if stream}.
+    Other keywords (tolerance, p_level, antithetic, stratify) as for simulate_joint_paths.
+    """
+    return simulate_joint_paths(buckets, term, products, p_high, neg_rules, seed, n_sims,
+                                stream=stream, block=block, **kw)[0]
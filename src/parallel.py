@@ -0,0 +1,242 @@
+from dataclasses import dataclass
+from functools import partial
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from .config import CFG
+from . import profiling
+from .analysis import BucketStore
+from .hourly import HourlyHistory
+from .monte_carlo import simulate_merchant_price_per_mwh, summarize_merchant_price, simulate_joint_paths
+from .sketch import QuantileSketch
+from .utils import percentile_from_p_level
+from .valuation import p_level_price, p_level_ci
+
+# per-process state: bucket stores, term sheets and hourly history dirs by asset
+_W = {}
+
+class SharedBuckets:
+    """
+    Packs every asset's BucketStore arrays into one shared-memory block.
+    Workers attach by name in the pool initializer, so buckets are never
+    pickled per task.
+    """
+    def __init__(self, stores: dict):
+        layout, total = {}, 0
+        for asset, st in stores.items():
+            for k, a in st.arrays().items():
+                a = np.ascontiguousarray(a)
+                layout[(asset, k)] = (total, a.dtype.str, a.shape)
+                total += -(-a.nbytes // 8) * 8          # keep 8-byte alignment
+        self.shm = shared_memory.SharedMemory(create=True, size=max(total, 8))
+        for (asset, k), (off, dt, shape) in layout.items():
+            a = stores[asset].arrays()[k]
+            np.ndarray(shape, dtype=dt, buffer=self.shm.buf, offset=off)[...] = a
+        self.spec = (self.shm.name, layout)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+def attach_buckets(spec):
+    """Rebuild {asset: BucketStore} as read-only views over a SharedBuckets block."""
+    name, layout = spec
+    shm = shared_memory.SharedMemory(name=name)
+    arrs = {}
+    for (asset, k), (off, dt, shape) in layout.items():
+        a = np.ndarray(shape, dtype=dt, buffer=shm.buf, offset=off)
+        a.flags.writeable = False
+        arrs.setdefault(asset, {})[k] = a
+    return shm, {asset: BucketStore.from_arrays(a) for asset, a in arrs.items()}
+
+def _init_worker(spec, terms, hourly=None):
+    _W["shm"], _W["stores"] = attach_buckets(spec)
+    _W["terms"] = terms
+    _W["hourly"] = hourly or {}
+
+def _hourly(asset):
+    """This process's memory-mapped HourlyHistory for `asset`, opened once per directory."""
+    path = _W["hourly"][asset]
+    opened = _W.setdefault("hourly_open", {})
+    if path not in opened:
+        opened[path] = HourlyHistory.open(path)
+    return opened[path]
+
+@dataclass
+class SimTask:
+    asset: str
+    products: tuple
+    neg_rules: tuple
+    seed: np.random.SeedSequence
+    sims: int
+    p_level: int
+    engine: str = None
+    stream: bool = False      # return QuantileSketches instead of sim arrays
+    crn: bool = False         # one joint draw for all products/neg-rules (simulate_joint)
+    shard: int = 0
+    waccs: tuple = ()         # per-path revenue NPVs at these rates (vectorized engine)
+    tolerance: float = None   # adaptive sim count: stop once the P-level CI is this narrow
+    antithetic: bool = None
+    stratify: bool = None
+
+    @property
+    def sim_kw(self):
+        return dict(tolerance=self.tolerance, p_level=self.p_level,
+                    antithetic=self.antithetic, stratify=self.stratify)
+
+    @property
+    def keys(self):
+        return [(self.asset, p, neg) for p in self.products for neg in self.neg_rules]
+
+def _shards(ss, sims, stream, adaptive=False, hourly=False):
+    """
+    [(seed, sims)]; in streaming mode, split into STREAM_SHARD_SIMS shards seeded
+    by children of `ss` (HOURLY_SHARD_SIMS for the hourly engine, streaming or
+    not, so its heavy paths spread over workers). Adaptive runs are never
+    sharded (they stop on a joint CI).
+    """
+    size = CFG.HOURLY_SHARD_SIMS if hourly else CFG.STREAM_SHARD_SIMS
+    if adaptive or not ((stream or hourly) and sims > size):
+        return [(ss, sims)]
+    n = -(-sims // size)
+    sizes = [size]*(n-1) + [sims - size*(n-1)]
+    return list(zip(ss.spawn(n), sizes))
+
+def make_tasks(assets, products, neg_rule, sims, p_level, engine, seed, stream: bool = False,
+               crn: bool = False, waccs=(), tolerance: float = None, antithetic: bool = None,
+               stratify: bool = None):
+    """
+    Independent mode: one task per (asset, product, negative_rule). Each
+    (asset, product) gets its own SeedSequence child, in a fixed order, so draws
+    do not depend on worker count; the negative-rule rerun reuses its pair's
+    child (same draws, as before).
+    CRN mode (vectorized and hourly engines): one task per asset, seeded by the asset's
+    child, that derives every product and negative-rule variant from shared draws.
+    In streaming mode sims are further split into STREAM_SHARD_SIMS shards whose
+    sketches are merged; hourly runs into HOURLY_SHARD_SIMS shards. With a tolerance, `sims` is the per-task cap.
+    """
+    negs = (False, True) if neg_rule else (False,)
+    engine = engine or CFG.SIM_ENGINE
+    crn = crn and engine in ("vectorized", "hourly")
+    hourly = engine == "hourly"
+    tolerance = CFG.SIM_TOLERANCE if tolerance is None else tolerance
+    opts = dict(p_level=p_level, engine=engine, stream=stream, waccs=tuple(waccs),
+                tolerance=tolerance, antithetic=antithetic, stratify=stratify)
+    root = np.random.SeedSequence(seed)
+    tasks = []
+    if crn:
+        for asset, ss in zip(assets, root.spawn(len(assets))):
+            for i, (sss, n_sims) in enumerate(_shards(ss, sims, stream, bool(tolerance), hourly)):
+                tasks.append(SimTask(asset, tuple(products), negs, sss, n_sims, crn=True, shard=i, **opts))
+        return tasks
+    children = iter(root.spawn(len(assets)*len(products)))
+    for asset in assets:
+        for product in products:
+            shards = _shards(next(children), sims, stream, bool(tolerance), hourly)
+            for neg in negs:
+                for i, (sss, n_sims) in enumerate(shards):
+                    tasks.append(SimTask(asset, (product,), (neg,), sss, n_sims, shard=i, **opts))
+    return tasks
+
+def run_task(task: SimTask):
+    """
+    Simulate one task (shard); returns [(key, (prices, npvs))] where prices is
+    a sim array or QuantileSketch and npvs a (sims, rates) array, a list of
+    per-rate sketches, or None (loop engine).
+    """
+    product = task.products[0] if len(task.products) == 1 else None
+    with profiling.stage("simulate", task.asset, product):
+        return _run_task(task)
+
+def _run_task(task: SimTask):
+    store, term = _W["stores"][task.asset], _W["terms"][task.asset]
+    engine = task.engine or CFG.SIM_ENGINE
+    if task.crn or engine in ("vectorized", "hourly"):
+        # a single product/neg-rule through the joint engine draws exactly its own stream
+        prices, npvs = simulate_joint_paths(store, term, task.products, store.p_high, task.neg_rules,
+                                            task.seed, task.sims, waccs=task.waccs, stream=task.stream,
+                                            hourly=_hourly(task.asset) if engine == "hourly" else None,
+                                            **task.sim_kw)
+        return [((task.asset, p, neg), (v, npvs.get((p, neg)))) for (p, neg), v in prices.items()]
+    kw = dict(buckets=store, term=term, product=task.products[0],
+              p_high=store.p_high, negative_rule=task.neg_rules[0],
+              seed=task.seed, n_sims=task.sims, engine=task.engine, **task.sim_kw)
+    if task.stream:
+        return [(task.keys[0], (summarize_merchant_price(**kw), None))]
+    return [(task.keys[0], (simulate_merchant_price_per_mwh(**kw), None))]
+
+def _run_profiled(fn, task):
+    """Worker-side fn(task) that also returns the worker's timing records."""
+    profiling.enable()
+    profiling.reset()
+    return fn(task), profiling.snapshot()
+
+def _merge_profiles(outputs):
+    for out, snap in outputs:
+        profiling.merge(snap)
+        yield out
+
+def summary_stats(sims_or_sketch, p_level: int):
+    """
+    P-level price, P50, mean, sim count and the CI on the P-level price
+    (plus the sketch error bound in streaming mode).
+    """
+    ci_low, ci_high = p_level_ci(sims_or_sketch, p_level)
+    if isinstance(sims_or_sketch, QuantileSketch):
+        sk = sims_or_sketch
+        q = percentile_from_p_level(p_level)
+        return {"p_price": sk.percentile(q), "p50": sk.percentile(50), "mean": sk.mean,
+                "n_sims": sk.count, "ci_low": ci_low, "ci_high": ci_high,
+                "p_err": float(sk.error_bound(q))}
+    return {"p_price": p_level_price(sims_or_sketch, p_level=p_level),
+            "p50": float(np.percentile(sims_or_sketch, 50)),
+            "mean": float(np.mean(sims_or_sketch)),
+            "n_sims": len(sims_or_sketch), "ci_low": ci_low, "ci_high": ci_high}
+
+def _merge(a, b):
+    if a is None or b is None: return None
+    if isinstance(a, QuantileSketch): return a.merge(b)
+    if isinstance(a, list): return [x.merge(y) for x, y in zip(a, b)]
+    return np.concatenate([a, b])
+
+def _collect(tasks, outputs):
+    """Merge shard outputs per key, in shard order."""
+    merged = {}
+    for task, pairs in zip(tasks, outputs):
+        for key, (prices, npvs) in pairs:
+            if key not in merged:
+                merged[key] = (prices, npvs)
+            else:
+                merged[key] = (_merge(merged[key][0], prices), _merge(merged[key][1], npvs))
+    return merged
+
+def attach_stats(results: dict, p_level: int):
+    """{key: (sims, npvs)} -> {key: (sims, stats, npvs)} with summary_stats at p_level."""
+    return {k: (v, summary_stats(v, p_level), npv) for k, (v, npv) in results.items()}
+
+def map_tasks(fn, tasks, stores: dict, terms: dict, workers: int = 1, hourly: dict = None):
+    """
+    [fn(task) for task in tasks], in-process (workers<=1) or on a process pool
+    whose workers attach the shared bucket stores, term sheets and hourly
+    history dirs (`_W`) once. Worker timings are merged when profiling.
+    """
+    if workers <= 1:
+        _W.update(stores=stores, terms=terms, hourly=hourly or {})
+        return [fn(t) for t in tasks]
+    shared = SharedBuckets(stores)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shared.spec, terms, hourly)) as pool:
+            if profiling.enabled():
+                return list(_merge_profiles(pool.map(partial(_run_profiled, fn), tasks)))
+            return list(pool.map(fn, tasks))
+    finally:
+        shared.close()
+
+def run_tasks(tasks, stores: dict, terms: dict, workers: int = 1, hourly: dict = None):
+    """
+    Run simulation tasks via map_tasks. `hourly` maps asset -> HourlyHistory
+    directory for hourly-engine tasks.
+    Returns {key: (sims, npvs)}; npvs is None unless the task had waccs.
+    """
+    return _collect(tasks, map_tasks(run_task, tasks, stores, terms, workers, hourly))
@@ -0,0 +1,115 @@
+"""
+Portfolio simulation with market-shared hub draws.
+
+Every sim draws each market's hub path once (from the market's reference
+asset, the first one listed for that market) and every asset in that market
+settles against it, with its own generation and basis draws on top. Tasks
+hold up to PORTFOLIO_CHUNK_ASSETS assets of one market; a market split over
+several tasks redraws the identical hub path from the market's seed, so
+results do not depend on chunking or worker count.
+"""
+import zlib
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from .config import CFG
+from . import profiling
+from .monte_carlo import _Cells, _draw_gen, _draw_hub, _draw_basis, _node_price
+from .parallel import _W
+from .utils import percentile_from_p_level
+from .valuation import discount_vector, npv_distribution
+
+def _seed(seed, kind: int, name: str):
+    """SeedSequence from a stable name (0 = market hub, 1 = asset), so registry edits leave other draws alone."""
+    return np.random.SeedSequence([seed, kind, zlib.crc32(name.encode())])
+
+@dataclass
+class PortfolioTask:
+    market: str
+    ref: str            # asset whose hub history drives the market's shared hub draws
+    assets: tuple
+    products: tuple
+    neg_rules: tuple
+    sims: int
+    seed: int
+
+def make_portfolio_tasks(assets, products, neg_rule, sims, seed, chunk: int = None):
+    """One task per market, split into chunks of at most `chunk` assets (default PORTFOLIO_CHUNK_ASSETS)."""
+    chunk = chunk or CFG.PORTFOLIO_CHUNK_ASSETS
+    negs = (False, True) if neg_rule else (False,)
+    by_market = {}
+    for a in assets:
+        by_market.setdefault(CFG.ASSETS[a]["market"], []).append(a)
+    return [PortfolioTask(mk, members[0], tuple(members[i:i + chunk]), tuple(products), negs, sims, seed)
+            for mk, members in by_market.items() for i in range(0, len(members), chunk)]
+
+def run_portfolio_task(task: PortfolioTask):
+    with profiling.stage("portfolio", task.market):
+        return _run_portfolio_task(task)
+
+def _run_portfolio_task(task: PortfolioTask):
+    """{(asset, product, neg): (revenue, gen MWh, revenue NPV @ WACC_ANNUAL)} per sim."""
+    stores, terms = _W["stores"], _W["terms"]
+    markets = [mk for mk in ("RT", "DA") if any(p.startswith(mk) for p in task.products)]
+    basis_markets = [mk for mk in markets if f"{mk}_BUS" in task.products]
+    ref, ref_store = _Cells(stores[task.ref], terms[task.ref], markets), stores[task.ref]
+    hub_mean = {mk: np.nan_to_num(v) for mk, v in ref.hub_mean.items()}
+    cells = {}
+    for a in task.assets:
+        cells[a] = _Cells(stores[a], terms[a], markets)
+        cells[a].hub_mean = hub_mean          # residuals are taken against the shared hub's own means
+    hub_rng = np.random.default_rng(_seed(task.seed, 0, task.market))
+    rngs = {a: np.random.default_rng(_seed(task.seed, 1, a)) for a in task.assets}
+    disc = discount_vector(len(terms[task.ref].table), CFG.WACC_ANNUAL)
+
+    acc = {(a, p, neg): [] for a in task.assets for p in task.products for neg in task.neg_rules}
+    for start in range(0, task.sims, CFG.SIM_BLOCK_SIZE):
+        n = min(CFG.SIM_BLOCK_SIZE, task.sims - start)
+        hub = _draw_hub(ref_store, ref, markets, ref_store.p_high, hub_rng, n)
+        for a in task.assets:
+            profiling.count("sims", n)
+            eff0 = _draw_gen(cells[a], rngs[a], n)
+            basis = _draw_basis(stores[a], cells[a], basis_markets, rngs[a], n)
+            for product in task.products:
+                node = _node_price(product, cells[a], hub, basis, CFG.BASIS_STRESS_ALPHA)
+                for neg in task.neg_rules:
+                    eff = np.where(node < 0, 0.0, eff0) if neg else eff0
+                    rev = (eff * node).sum(axis=2)
+                    acc[(a, product, neg)].append((rev.sum(axis=1), eff.sum(axis=(1, 2)), rev @ disc))
+    return {k: tuple(np.concatenate(x) for x in zip(*v)) for k, v in acc.items()}
+
+def summarize_portfolio(results: dict, assets, p_level: int = None):
+    """
+    (summary, contributions) DataFrames per (product, negative_rule).
+    summary: portfolio gen-weighted $/MWh at the P-level and the portfolio NPV
+    distribution (npv_distribution), against the sum of standalone P-level NPVs.
+    contributions, per asset: standalone NPV mean and P-level; `tail_contribution`,
+    the asset's mean NPV over the portfolio's paths at or below its P-level
+    (these add up to the portfolio's tail mean); and `marginal_p`, how much the
+    portfolio P-level NPV drops if the asset is removed.
+    """
+    p_level = p_level or CFG.P_LEVEL
+    q = percentile_from_p_level(p_level)
+    summary, contrib = [], []
+    for product, neg in sorted({(p, n) for _, p, n in results}):
+        rev, gen, npv = (np.stack([results[(a, product, neg)][i] for a in assets]) for i in range(3))
+        port = npv.sum(axis=0)
+        tot_gen = gen.sum(axis=0)
+        price = np.divide(rev.sum(axis=0), tot_gen, out=np.zeros_like(tot_gen), where=tot_gen > 0)
+        port_p = float(np.percentile(port, q))
+        standalone = np.percentile(npv, q, axis=1)
+        tail = port <= port_p
+        without = np.percentile(port[None, :] - npv, q, axis=1)
+        summary.append({"product": product, "negative_rule": neg, "n_assets": len(assets), "n_sims": len(port),
+                        f"p{p_level}_price": float(np.percentile(price, q)),
+                        **npv_distribution(port, sorted({*CFG.NPV_P_LEVELS, p_level})),
+                        "standalone_p_sum": float(standalone.sum()),
+                        "diversification": port_p - float(standalone.sum())})
+        tail_mean = npv[:, tail].mean(axis=1)
+        for i, a in enumerate(assets):
+            contrib.append({"asset": a, "market": CFG.ASSETS[a]["market"], "product": product,
+                            "negative_rule": neg, "npv_mean": float(npv[i].mean()),
+                            f"npv_p{p_level}": float(standalone[i]), "tail_contribution": float(tail_mean[i]),
+                            "tail_share": float(tail_mean[i] / tail_mean.sum()) if tail_mean.sum() else 0.0,
+                            "marginal_p": port_p - float(without[i])})
+    return pd.DataFrame(summary), pd.DataFrame(contrib)
@@ -0,0 +1,99 @@
+"""
+Opt-in stage timers and counters, grouped by (stage, asset, product).
+
+    with profiling.stage("simulate", asset, product): ...
+    profiling.count("sims", n)        # attributed to the innermost open stage
+
+Both are no-ops (one flag check) unless enable() was called.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+import pandas as pd
+
+# (stage, asset, product) -> {"calls", "seconds", <counter>: value}
+_REC = {}
+_LOCAL = threading.local() # per-thread stack of open (stage, asset, product) keys
+_LOCK = threading.Lock()
+_ON = False
+_NULL = nullcontext()
+
+def enable(on: bool = True):
+    global _ON
+    _ON = on
+
+def enabled():
+    return _ON
+
+def _ctx():
+    if not hasattr(_LOCAL, "stack"): _LOCAL.stack = []
+    return _LOCAL.stack
+
+def reset():
+    _REC.clear()
+    _ctx().clear()
+
+@contextmanager
+def _timed(key):
+    stack = _ctx()
+    stack.append(key)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        stack.pop()
+        with _LOCK:
+            r = _REC.setdefault(key, {"calls": 0, "seconds": 0.0})
+            r["calls"] += 1
+            r["seconds"] += dt
+
+def stage(name: str, asset: str = None, product: str = None):
+    """Time a block under (name, asset, product). A shared no-op context when profiling is off."""
+    if not _ON: return _NULL
+    return _timed((name, asset, product))
+
+def count(name: str, n=1):
+    """Add `n` to counter `name` of the innermost open stage (no-op when off or outside a stage)."""
+    if not _ON: return
+    stack = _ctx()
+    if not stack: return
+    with _LOCK:
+        r = _REC.setdefault(stack[-1], {"calls": 0, "seconds": 0.0})
+        r[name] = r.get(name, 0) + n
+
+def snapshot():
+    return {k: dict(v) for k, v in _REC.items()}
+
+def merge(snap: dict):
+    """Fold a snapshot (e.g. from a worker process) into this process's records."""
+    with _LOCK:
+        for k, v in snap.items():
+            r = _REC.setdefault(k, {"calls": 0, "seconds": 0.0})
+            for name, x in v.items():
+                r[name] = r.get(name, 0) + x
+
+def report():
+    """One row per (stage, asset, product): calls, seconds, counters and <counter>_per_sec."""
+    rows = []
+    for (name, asset, product), v in _REC.items():
+        row = {"stage": name, "asset": asset, "product": product, **v}
+        for c, x in v.items():
+            if c not in ("calls", "seconds") and v["seconds"] > 0:
+                row[f"{c}_per_sec"] = x / v["seconds"]
+        rows.append(row)
+    cols = ["stage", "asset", "product", "calls", "seconds"]
+    return pd.DataFrame(rows, columns=cols if not rows else None)
+
+def write_report(out_dir: str, prefix: str = "profile"):
+    """Write <prefix>.csv and <prefix>.json to out_dir; returns the two paths."""
+    df = report()
+    csv_path = os.path.join(out_dir, f"{prefix}.csv")
+    json_path = os.path.join(out_dir, f"{prefix}.json")
+    df.to_csv(csv_path, index=False)
+    with open(json_path, "w") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "stages": json.loads(df.to_json(orient="records"))}, f, indent=2)
+    return csv_path, json_path
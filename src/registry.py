@@ -0,0 +1,49 @@
+import os
+import pandas as pd
+from .config import CFG
+
+COLUMNS = ("asset", "market", "type", "history")
+
+def load_registry(path: str):
+    """
+    Asset registry CSV -> CFG.ASSETS-style {asset: {"market", "type"[, "history"]}}.
+    Columns: asset, market (required), type (default Wind) and history, the
+    hourly CSV relative to RAW_DIR (default <market>_<asset>.csv, lowercased).
+    Row order is kept; within a market the first asset supplies the shared hub
+    history for portfolio runs.
+    """
+    df = pd.read_csv(path, dtype=str, skipinitialspace=True, comment="#").fillna("")
+    df.columns = [c.strip().lower() for c in df.columns]
+    missing = {"asset", "market"} - set(df.columns)
+    if missing:
+        raise ValueError(f"{path}: missing column(s) {sorted(missing)}; expected {list(COLUMNS)}")
+    unknown = set(df.columns) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"{path}: unknown column(s) {sorted(unknown)}; expected {list(COLUMNS)}")
+    dup = df["asset"][df["asset"].duplicated()]
+    if len(dup):
+        raise ValueError(f"{path}: duplicate asset(s) {sorted(set(dup))}")
+    assets = {}
+    for r in df.to_dict("records"):
+        if not r["asset"] or not r["market"]:
+            raise ValueError(f"{path}: every row needs an asset and a market ({r})")
+        meta = {"market": r["market"].upper(), "type": r.get("type") or "Wind"}
+        if r.get("history"):
+            meta["history"] = r["history"]
+        assets[r["asset"]] = meta
+    return assets
+
+def write_registry(assets: dict, path: str):
+    """Inverse of load_registry."""
+    rows = [{"asset": a, "market": m["market"], "type": m.get("type", ""), "history": m.get("history", "")}
+            for a, m in assets.items()]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    pd.DataFrame(rows, columns=list(COLUMNS)).to_csv(path, index=False)
+    return path
+
+def use_registry(path: str = None):
+    """Replace CFG.ASSETS with the registry at `path` (default CFG.ASSET_REGISTRY); returns the asset names."""
+    path = path or CFG.ASSET_REGISTRY
+    if path:
+        CFG.ASSETS = load_registry(path)
+    return list(CFG.ASSETS)
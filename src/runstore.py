@@ -0,0 +1,229 @@
+"""
+Run history: every valuation's inputs hash, config, summary tables and sim
+arrays, appended to an embedded store under RUNS_DIR.
+
+    runs.sqlite           runs + one table per summary, indexed on (run_id, asset, product)
+    sims-<key>.npz        compressed per-path $/MWh and NPV arrays of one simulation
+    terms-<key>.pkl       the term sheets the run was valued against
+
+Array and term files are named by the inputs hash and the memo stage keys, so
+a rerun that reuses a memoized simulation (new P-level, new WACC_ANNUAL) shares
+the earlier run's files.
+Each run is written in one transaction; the CSVs in OUT_RESULTS are exports
+of the latest run.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from .config import CFG
+from .parallel import summary_stats
+from .utils import umask_mode
+from .valuation import compute_components
+
+RUN_COLUMNS = ("created", "label", "inputs_hash", "sim_key", "p_level", "sims", "neg_rule", "engine",
+               "config", "args", "sims_file", "terms_file")
+TABLES = {
+    "prices": ("asset", "market", "product", "hub_component", "basis_component", "risk_adj", "neg_adj",
+               "p_price", "n_sims", "p_ci_low", "p_ci_high"),
+    "generation": ("asset", "market", "year", "month", "expected_mwh", "peak_mwh", "off_mwh",
+                   "peak_pct", "off_pct"),
+    "npv": ("asset", "market", "merchant_p50_price", "fixed_p75_price", "merchant_p50_npv",
+            "fixed_p75_npv", "delta_pct"),
+    "npv_distribution": ("asset", "market", "product", "negative_rule", "wacc", "metric", "value"),
+    "sims": ("asset", "product", "negative_rule", "n_sims", "prices_key", "npv_key"),
+}
+KEYS = {"prices": ("asset", "product"), "generation": ("asset", "year", "month"), "npv": ("asset",),
+        "npv_distribution": ("asset", "product", "negative_rule", "wacc", "metric"),
+        "sims": ("asset", "product", "negative_rule")}
+
+def _atomic_write(path: str, write):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        write(f)
+    os.chmod(tmp, umask_mode())
+    os.replace(tmp, path)
+
+class RunStore:
+    """SQLite run history plus columnar sim files in `root` (default CFG.RUNS_DIR)."""
+    def __init__(self, root: str = None):
+        self.root = root or CFG.RUNS_DIR
+        os.makedirs(self.root, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(self.root, "runs.sqlite"))
+        with self.conn:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                              f"{', '.join(RUN_COLUMNS)})")
+            for t, cols in TABLES.items():
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {t} (run_id INTEGER NOT NULL "
+                                  f"REFERENCES runs(run_id), {', '.join(cols)})")
+                idx = ("run_id", "asset", "product") if "product" in cols else ("run_id", "asset")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{t}_run ON {t} ({', '.join(idx)})")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS ix_prices_trend ON prices (asset, product, run_id)")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _save_sims(self, results: dict, key: str):
+        """Write the ndarray sims of `results` ({(asset, product, neg): (sims, npv)}) once per key."""
+        arrays, rows = {}, []
+        for i, ((asset, product, neg), (sims, npv)) in enumerate(sorted(results.items())):
+            if not isinstance(sims, np.ndarray):          # streaming runs keep sketches, not paths
+                rows.append((asset, product, bool(neg), int(sims.count), None, None))
+                continue
+            pk, nk = f"p{i}", (f"n{i}" if isinstance(npv, np.ndarray) else None)
+            arrays[pk] = sims
+            if nk: arrays[nk] = npv
+            rows.append((asset, product, bool(neg), len(sims), pk, nk))
+        if not arrays:
+            return None, rows
+        name = f"sims-{key}.npz"
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            _atomic_write(path, lambda f: np.savez_compressed(f, **arrays))
+        return name, rows
+
+    def _save_terms(self, terms: dict, key: str):
+        name = f"terms-{key}.pkl"
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            _atomic_write(path, lambda f: pickle.dump(terms, f, protocol=pickle.HIGHEST_PROTOCOL))
+        return name
+
+    def record(self, meta: dict, tables: dict, results: dict = None, terms: dict = None, terms_key: str = None):
+        """
+        Append one run: `meta` (RUN_COLUMNS; config defaults to CFG), {table: DataFrame}
+        for TABLES, and optionally the raw results {(asset, product, neg): (sims, npv)}
+        and term sheets. Files are named by meta's inputs_hash plus sim_key / terms_key.
+        Returns the new run_id.
+        """
+        meta = dict(meta)
+        meta.setdefault("created", time.strftime("%Y-%m-%dT%H:%M:%S"))
+        meta.setdefault("config", json.dumps(dataclasses.asdict(CFG), default=str, sort_keys=True))
+        meta["args"] = json.dumps(meta.get("args") or {}, default=str, sort_keys=True)
+        tables = dict(tables)
+        key = lambda k: hashlib.sha256(f"{meta.get('inputs_hash')}|{k}".encode()).hexdigest()[:20]
+        if results is not None:
+            meta["sims_file"], rows = self._save_sims(results, key(meta.get("sim_key")))
+            tables["sims"] = pd.DataFrame(rows, columns=TABLES["sims"])
+        if terms is not None:
+            meta["terms_file"] = self._save_terms(terms, key(terms_key))
+        with self.conn:                                   # one transaction per run
+            cur = self.conn.execute(f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}) VALUES "
+                                    f"({', '.join('?' * len(RUN_COLUMNS))})", [meta.get(c) for c in RUN_COLUMNS])
+            run_id = cur.lastrowid
+            for t, df in tables.items():
+                cols = TABLES[t]
+                rows = df[list(cols)].astype(object).where(df[list(cols)].notna(), None).itertuples(index=False)
+                self.conn.executemany(f"INSERT INTO {t} (run_id, {', '.join(cols)}) VALUES "
+                                      f"({', '.join('?' * (len(cols) + 1))})", ((run_id, *r) for r in rows))
+        return run_id
+
+    def resolve(self, run):
+        """Run id from an id, 'latest' or a negative offset (-1 = latest, -2 = the one before)."""
+        run = str(run)
+        if run == "latest": run = "-1"
+        if run.lstrip("-").isdigit() and int(run) < 0:
+            ids = [r[0] for r in self.conn.execute("SELECT run_id FROM runs ORDER BY run_id DESC LIMIT ?",
+                                                   (-int(run),))]
+            if len(ids) < -int(run):
+                raise ValueError(f"only {len(ids)} run(s) recorded")
+            return ids[-1]
+        if self.conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (int(run),)).fetchone() is None:
+            raise ValueError(f"no run {run}")
+        return int(run)
+
+    def runs(self, limit: int = None):
+        sql = ("SELECT run_id, created, label, engine, p_level, sims, neg_rule, inputs_hash, sims_file "
+               "FROM runs ORDER BY run_id DESC")
+        return pd.read_sql_query(sql + (f" LIMIT {int(limit)}" if limit else ""), self.conn)
+
+    def meta(self, run):
+        row = pd.read_sql_query("SELECT * FROM runs WHERE run_id = ?", self.conn, params=(self.resolve(run),))
+        out = row.iloc[0].to_dict()
+        out["config"], out["args"] = json.loads(out["config"] or "{}"), json.loads(out["args"] or "{}")
+        return out
+
+    def table(self, name: str, run, **where):
+        """One run's rows of a summary table, optionally filtered by column equality."""
+        if name not in TABLES:
+            raise ValueError(f"unknown table {name!r}; expected one of {list(TABLES)}")
+        cond = "".join(f" AND {c} = ?" for c in where)
+        out = pd.read_sql_query(f"SELECT {', '.join(TABLES[name])} FROM {name} WHERE run_id = ?{cond} "
+                                f"ORDER BY rowid", self.conn, params=(self.resolve(run), *where.values()))
+        if "negative_rule" in out:                        # SQLite keeps booleans as 0/1
+            out["negative_rule"] = out["negative_rule"].astype(bool)
+        return out
+
+    def diff(self, a, b, name: str = "prices"):
+        """Rows of `name` in runs a and b joined on the table's keys, with <col>_a, <col>_b, <col>_delta."""
+        keys = list(KEYS[name])
+        da, db = self.table(name, a), self.table(name, b)
+        out = da.merge(db, on=keys, how="outer", suffixes=("_a", "_b"))
+        cols = [c for c in TABLES[name] if c not in keys and c != "market"]
+        for c in cols:
+            if pd.api.types.is_numeric_dtype(out[f"{c}_a"]) and pd.api.types.is_numeric_dtype(out[f"{c}_b"]):
+                out[f"{c}_delta"] = out[f"{c}_b"] - out[f"{c}_a"]
+        return out[keys + [x for c in cols for x in (f"{c}_a", f"{c}_b", f"{c}_delta") if x in out]]
+
+    def trend(self, asset: str, product: str = None, metric: str = "p_price", name: str = "prices"):
+        """`metric` of one asset (and product) across every recorded run, oldest first."""
+        if metric not in TABLES[name]:
+            raise ValueError(f"{name} has no column {metric!r}")
+        cond, params = "t.asset = ?", [asset]
+        if product is not None:
+            cond, params = cond + " AND t.product = ?", params + [product]
+        sql = (f"SELECT r.run_id, r.created, r.label, r.p_level, r.sims, t.{metric} "
+               f"FROM {name} t JOIN runs r USING (run_id) WHERE {cond} ORDER BY r.run_id")
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def load_sims(self, run):
+        """{(asset, product, neg): (sims, npv or None)} as simulated for the run (ndarray runs only)."""
+        m = self.meta(run)
+        if not m["sims_file"]:
+            raise ValueError(f"run {m['run_id']} has no stored sim arrays (streaming run or recorded without sims)")
+        index = self.table("sims", m["run_id"])
+        with np.load(os.path.join(self.root, m["sims_file"])) as z:
+            return {(r.asset, r.product, bool(r.negative_rule)):
+                    (z[r.prices_key], z[r.npv_key] if r.npv_key else None)
+                    for r in index.itertuples() if r.prices_key}
+
+    def load_terms(self, run):
+        m = self.meta(run)
+        if not m["terms_file"]:
+            raise ValueError(f"run {m['run_id']} has no stored term sheets")
+        with open(os.path.join(self.root, m["terms_file"]), "rb") as f:
+            return pickle.load(f)
+
+def revalue(store: RunStore, run, p_level: int, neg_rule: bool = None):
+    """
+    A past run's prices table at another P-level (and negative-rule setting,
+    default the run's), from its stored sims and term sheets; nothing is re-simulated.
+    """
+    sims, terms = store.load_sims(run), store.load_terms(run)
+    neg_rule = bool(store.meta(run)["neg_rule"]) if neg_rule is None else neg_rule
+    rows = []
+    for (asset, product, neg), (s, _) in sorted(sims.items()):
+        if neg: continue
+        stats = summary_stats(s, p_level)
+        if neg_rule and (asset, product, True) not in sims:
+            raise ValueError(f"run has no negative-rule sims for {asset} {product}")
+        neg_p = summary_stats(sims[(asset, product, True)][0], p_level)["p_price"] if neg_rule else None
+        hub, basis, risk, neg_adj, price = compute_components(asset, product, terms[asset], stats["p_price"], neg_p)
+        rows.append({"asset": asset, "market": CFG.ASSETS.get(asset, {}).get("market"), "product": product,
+                     "hub_component": round(hub, 2), "basis_component": round(basis, 2),
+                     "risk_adj": round(risk, 2), "neg_adj": round(neg_adj, 2), "p_price": round(price, 2),
+                     "n_sims": stats["n_sims"], "p_ci_low": round(stats["ci_low"], 2),
+                     "p_ci_high": round(stats["ci_high"], 2)})
+    return pd.DataFrame(rows, columns=TABLES["prices"])
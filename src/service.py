@@ -0,0 +1,206 @@
+"""
+Local HTTP/JSON quoting service with warm bucket stores and term sheets.
+
+    GET  /health
+    GET  /price?asset=Mantero&product=RT_BUS&p_level=75&sims=3000&neg_rule=false
+    POST /price   {"asset": ..., "product": ..., ...}   (same fields as JSON)
+    POST /reload  re-run the input stages (e.g. after forward_curves.csv changed)
+
+Simulation is per (asset, sims) with the asset's CRN seed, so a quote equals
+main.py's price for the same settings; every product, P-level and negative
+rule of that asset is then read off the cached draws. Identical concurrent requests
+share one in-flight simulation.
+"""
+import asyncio
+import json
+import os
+import signal
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qsl
+from .config import CFG
+from .parallel import SharedBuckets, _init_worker, make_tasks, run_task, summary_stats
+from .valuation import compute_components
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            500: "Internal Server Error"}
+
+def _ping(_=None):
+    return os.getpid()
+
+def _bool(v):
+    if isinstance(v, bool): return v
+    if str(v).lower() in ("1", "true", "yes", "on"): return True
+    if str(v).lower() in ("0", "false", "no", "off", ""): return False
+    raise ValueError(f"not a boolean: {v!r}")
+
+class ValuationService:
+    """
+    prepare() -> (stores, gen_fcs, terms, term_keys), e.g. main._prepare without
+    the cache. Inputs live in this process and, for the pool workers, in one
+    SharedBuckets block that is swapped on reload.
+    """
+    def __init__(self, prepare, workers: int = None, cache_size: int = None):
+        self.prepare = prepare
+        self.workers = workers or CFG.SERVICE_WORKERS or os.cpu_count() or 1
+        self.cache_size = cache_size or CFG.SERVICE_CACHE
+        self.version = 0
+        self.pool = self.shared = None
+        self._done = OrderedDict()            # (version, asset, sims) -> {(product, neg): sims}
+        self._inflight = {}
+        self._reload_lock = asyncio.Lock()
+
+    def _load(self):
+        """Blocking: build inputs and a fresh worker pool over them."""
+        stores, gen_fcs, terms, term_keys = self.prepare()
+        shared = SharedBuckets(stores)
+        try:
+            pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                       initargs=(shared.spec, terms))
+            list(pool.map(_ping, range(self.workers)))   # start workers now, not on the first quote
+        except Exception:
+            shared.close()
+            raise
+        return stores, terms, shared, pool
+
+    async def reload(self):
+        """Swap in freshly prepared inputs; in-flight quotes finish on the old pool."""
+        async with self._reload_lock:
+            t0 = time.perf_counter()
+            stores, terms, shared, pool = await asyncio.to_thread(self._load)
+            old = (self.pool, self.shared)
+            self.stores, self.terms, self.shared, self.pool = stores, terms, shared, pool
+            self.loaded_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+            self.version += 1
+            self._done.clear()
+            if old[0] is not None:
+                await asyncio.to_thread(old[0].shutdown)
+                old[1].close()
+            return {"version": self.version, "seconds": round(time.perf_counter() - t0, 3)}
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.shared.close()
+
+    async def _simulate(self, key):
+        _, asset, sims = key
+        tasks = make_tasks(list(CFG.ASSETS), CFG.PRODUCTS, True, sims, CFG.P_LEVEL, "vectorized",
+                           CFG.RANDOM_SEED, crn=True)
+        task = next(t for t in tasks if t.asset == asset)
+        pairs = await asyncio.get_running_loop().run_in_executor(self.pool, run_task, task)
+        out = {k[1:]: v for k, (v, _) in pairs}
+        self._done[key] = out
+        while len(self._done) > self.cache_size:
+            self._done.popitem(last=False)
+        return out
+
+    async def _sims(self, asset, sims):
+        """{(product, neg): sims} for one asset: cached, joined in flight, or simulated."""
+        key = (self.version, asset, sims)
+        if key in self._done:
+            self._done.move_to_end(key)
+            return self._done[key], "cache"
+        fut = self._inflight.get(key)
+        how = "shared"
+        if fut is None:
+            fut = self._inflight[key] = asyncio.ensure_future(self._simulate(key))
+            fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+            how = "simulated"
+        return await asyncio.shield(fut), how
+
+    async def price(self, asset: str, product: str, p_level: int = None, sims: int = None, neg_rule=False):
+        """P-level price and its components for one asset/product, as in prices_summary.csv."""
+        p_level = int(p_level or CFG.P_LEVEL)
+        sims = int(sims or CFG.N_SIMS)
+        neg_rule = _bool(neg_rule)
+        if asset not in self.stores:
+            raise ValueError(f"unknown asset {asset!r}; expected one of {sorted(self.stores)}")
+        if product not in CFG.PRODUCTS:
+            raise ValueError(f"unknown product {product!r}; expected one of {list(CFG.PRODUCTS)}")
+        if not 1 <= p_level <= 99:
+            raise ValueError("p_level must be in 1..99")
+        if not 1 <= sims <= CFG.SERVICE_MAX_SIMS:
+            raise ValueError(f"sims must be in 1..{CFG.SERVICE_MAX_SIMS}")
+        t0 = time.perf_counter()
+        res, how = await self._sims(asset, sims)
+        stats = summary_stats(res[(product, neg_rule)], p_level)     # every statistic from the quoted sims
+        base_price = summary_stats(res[(product, False)], p_level)["p_price"] if neg_rule else stats["p_price"]
+        hub, basis, risk, neg_adj, price = compute_components(asset, product, self.terms[asset], base_price,
+                                                              stats["p_price"] if neg_rule else None)
+        return {"asset": asset, "market": CFG.ASSETS[asset]["market"], "product": product,
+                "p_level": p_level, "sims": sims, "neg_rule": neg_rule,
+                "price": round(price + neg_adj, 4), "hub_component": round(hub, 4),
+                "basis_component": round(basis, 4), "risk_adj": round(risk, 4), "neg_adj": round(neg_adj, 4),
+                "p50": round(stats["p50"], 4), "mean": round(stats["mean"], 4),
+                "ci_low": round(stats["ci_low"], 4), "ci_high": round(stats["ci_high"], 4),
+                "source": how, "version": self.version,
+                "elapsed_ms": round((time.perf_counter() - t0) * 1e3, 1)}
+
+    def health(self):
+        return {"status": "ok", "version": self.version, "loaded_at": self.loaded_at,
+                "assets": sorted(self.stores), "products": list(CFG.PRODUCTS),
+                "workers": self.workers, "cached": len(self._done), "in_flight": len(self._inflight)}
+
+    async def handle(self, method: str, target: str, body: bytes):
+        """Route one request; returns (status, payload)."""
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        if body:
+            params.update(json.loads(body))
+        if url.path == "/health" and method == "GET":
+            return 200, self.health()
+        if url.path == "/price" and method in ("GET", "POST"):
+            allowed = {"asset", "product", "p_level", "sims", "neg_rule"}
+            if set(params) - allowed or not {"asset", "product"} <= set(params):
+                raise ValueError("/price takes asset, product and optional p_level, sims, neg_rule")
+            return 200, await self.price(**params)
+        if url.path == "/reload" and method == "POST":
+            return 200, await self.reload()
+        if url.path in ("/health", "/price", "/reload"):
+            return 405, {"error": f"{method} not allowed on {url.path}"}
+        return 404, {"error": f"no route {url.path}"}
+
+    async def _serve_conn(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+            headers = {k.strip().lower(): v.strip() for k, v in
+                       (ln.split(":", 1) for ln in lines[1:] if ":" in ln)}
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            try:
+                status, payload = await self.handle(method, target, body)
+            except (ValueError, TypeError, KeyError) as e:
+                status, payload = 400, {"error": str(e)}
+            except Exception as e:
+                status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+            data = json.dumps(payload).encode()
+            writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def _serve(service, host, port):
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+    print(f"Loading inputs ({service.workers} sim workers)...")
+    info = await service.reload()
+    server = await asyncio.start_server(service._serve_conn, host, port)
+    print(f"Ready in {info['seconds']:.1f}s: http://{host}:{port}/price?asset=...&product=...")
+    async with server:
+        await stop.wait()
+
+def serve(prepare, host: str = None, port: int = None, workers: int = None):
+    """Run the service until SIGINT/SIGTERM; the worker pool and shared buckets are released on exit."""
+    service = ValuationService(prepare, workers)
+    try:
+        asyncio.run(_serve(service, host or CFG.SERVICE_HOST, port or CFG.SERVICE_PORT))
+    finally:
+        service.close()
+    print("Stopped")
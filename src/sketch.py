@@ -0,0 +1,103 @@
+import numpy as np
+from .config import CFG
+from .utils import percentile_from_p_level
+
+class QuantileSketch:
+    """
+    Mergeable log-bucket quantile sketch (DDSketch-style) for simulated $/MWh.
+
+    |x| is binned by ceil(log_gamma |x|) with gamma = (1+alpha)/(1-alpha), so any
+    reported quantile is within relative error `alpha` of the true sample
+    quantile. Bins cover |x| in [min_value, max_value] (values below go to a zero
+    bin, above are clamped) and are preallocated, so memory is constant in the
+    number of sims. Count, mean, min and max are exact. Sketches with the same
+    settings merge by adding bin counts.
+    """
+    def __init__(self, alpha: float = None, min_value: float = 1e-6, max_value: float = 1e12):
+        self.alpha = alpha or CFG.SKETCH_ALPHA
+        self.gamma = (1 + self.alpha) / (1 - self.alpha)
+        self._lg = np.log(self.gamma)
+        self.min_value, self.max_value = min_value, max_value
+        self._k0 = int(np.ceil(np.log(min_value) / self._lg))
+        nbins = int(np.ceil(np.log(max_value) / self._lg)) - self._k0 + 1
+        self.pos = np.zeros(nbins, dtype=np.int64)
+        self.neg = np.zeros(nbins, dtype=np.int64)
+        self.zero = 0
+        self.count, self.total = 0, 0.0
+        self.min, self.max = np.inf, -np.inf
+
+    def _keys(self, a):
+        k = np.ceil(np.log(np.clip(a, self.min_value, self.max_value)) / self._lg).astype(np.int64) - self._k0
+        return np.clip(k, 0, len(self.pos) - 1)
+
+    def update(self, x: np.ndarray):
+        x = np.asarray(x, dtype=float).ravel()
+        x = x[~np.isnan(x)]
+        if not len(x): return self
+        small = np.abs(x) < self.min_value
+        self.zero += int(small.sum())
+        p, n = x[(x > 0) & ~small], x[(x < 0) & ~small]
+        self.pos += np.bincount(self._keys(p), minlength=len(self.pos))
+        self.neg += np.bincount(self._keys(-n), minlength=len(self.neg))
+        self.count += len(x)
+        self.total += float(x.sum())
+        self.min, self.max = min(self.min, float(x.min())), max(self.max, float(x.max()))
+        return self
+
+    def merge(self, other: "QuantileSketch"):
+        if (other.alpha, other.min_value, other.max_value) != (self.alpha, self.min_value, self.max_value):
+            raise ValueError("Cannot merge sketches with different alpha/range")
+        self.pos += other.pos; self.neg += other.neg; self.zero += other.zero
+        self.count += other.count; self.total += other.total
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
+
+    def _ordered(self):
+        """(representative values, counts) of all bins in ascending value order."""
+        rep = 2 * self.gamma ** (np.arange(len(self.pos)) + self._k0) / (self.gamma + 1)
+        vals = np.concatenate([-rep[::-1], [0.0], rep])
+        cnts = np.concatenate([self.neg[::-1], [self.zero], self.pos])
+        return vals, cnts
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else np.nan
+
+    def percentile(self, q):
+        """np.percentile-style q in [0, 100]; scalar or array."""
+        if not self.count: return np.nan
+        vals, cnts = self._ordered()
+        rank = np.asarray(q, dtype=float) / 100.0 * (self.count - 1)
+        cum = np.cumsum(cnts)
+        at = lambda r: np.clip(vals[np.minimum(np.searchsorted(cum, r, side="right"), len(vals) - 1)],
+                               self.min, self.max)
+        # linear interpolation between neighbouring order statistics, as np.percentile does
+        r0 = np.floor(rank)
+        v0, v1 = at(r0), at(np.minimum(r0 + 1, self.count - 1))
+        out = v0 + (v1 - v0) * (rank - r0)
+        return float(out) if np.ndim(out) == 0 else out
+
+    def p_level(self, p_level: int):
+        return self.percentile(percentile_from_p_level(p_level))
+
+    def tail_mean(self, q):
+        """Mean of the lowest q% of values (CVaR-style), from bin representatives."""
+        if not self.count: return np.nan
+        vals, cnts = self._ordered()
+        k = max(q / 100.0 * self.count, 1.0)
+        take = np.minimum(cnts, np.maximum(k - (np.cumsum(cnts) - cnts), 0))
+        return float((np.clip(vals, self.min, self.max) * take).sum() / take.sum())
+
+    def error_bound(self, q):
+        """Absolute error bound on percentile(q): alpha * |value| (within the bin range)."""
+        return self.alpha * np.abs(self.percentile(q))
+
+    def histogram(self, bins: int = 50):
+        """(counts, edges) over [min, max] with `bins` equal bins, rebinned from the sketch."""
+        vals, cnts = self._ordered()
+        lo, hi = (self.min, self.max) if self.count else (0.0, 1.0)
+        if hi <= lo: hi = lo + 1.0
+        edges = np.linspace(lo, hi, bins + 1)
+        nz = cnts > 0
+        idx = np.clip(np.searchsorted(edges, np.clip(vals[nz], lo, hi), side="right") - 1, 0, bins - 1)
+        return np.bincount(idx, weights=cnts[nz], minlength=bins), edges
@@ -0,0 +1,121 @@
+import json
+from dataclasses import dataclass, fields
+import numpy as np
+import pandas as pd
+from .config import CFG
+from .analysis import BucketStore
+from .forecasting import TermSheet
+from .monte_carlo import _Cells, _draw_block, _node_price, _settle
+from .utils import percentile_from_p_level
+from .valuation import discount_matrix
+from . import profiling
+
+@dataclass
+class SweepSpec:
+    """
+    Scenario grid. Every combination of p_levels x basis_stress_alpha x wacc x
+    fwd_shift ($/MWh added to every hub forward; months without one stay at
+    0.0) is evaluated per asset, product and negative rule. None means the
+    current CFG value.
+    """
+    p_levels: tuple = (75,)
+    basis_stress_alpha: tuple = None
+    wacc: tuple = None
+    fwd_shift: tuple = (0.0,)
+    products: tuple = None
+    neg_rule: tuple = (False,)
+    sims: int = None
+    seed: int = None
+
+    def __post_init__(self):
+        self.basis_stress_alpha = tuple(self.basis_stress_alpha or (CFG.BASIS_STRESS_ALPHA,))
+        self.wacc = tuple(self.wacc or (CFG.WACC_ANNUAL,))
+        self.products = tuple(self.products or CFG.PRODUCTS)
+        self.p_levels, self.fwd_shift, self.neg_rule = tuple(self.p_levels), tuple(self.fwd_shift), tuple(self.neg_rule)
+        self.sims = self.sims or CFG.N_SIMS
+        self.seed = CFG.RANDOM_SEED if self.seed is None else self.seed
+
+    @property
+    def n_points(self):
+        return (len(self.p_levels) * len(self.basis_stress_alpha) * len(self.wacc) * len(self.fwd_shift)
+                * len(self.products) * len(self.neg_rule))
+
+def _axis(v):
+    """A grid axis from a scalar, a list, or {start, stop, num} (inclusive linspace)."""
+    if isinstance(v, dict):
+        return tuple(float(x) for x in np.linspace(v["start"], v["stop"], int(v["num"])))
+    return tuple(v) if isinstance(v, (list, tuple)) else (v,)
+
+def load_spec(path: str) -> SweepSpec:
+    """Read a YAML (needs PyYAML) or JSON sweep spec; keys are SweepSpec field names."""
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError as e:
+                raise ImportError("YAML sweep specs need PyYAML (pip install pyyaml); or use a .json spec") from e
+            raw = yaml.safe_load(f) or {}
+        else:
+            raw = json.load(f)
+    known = {fd.name for fd in fields(SweepSpec)}
+    unknown = set(raw) - known
+    if unknown:
+        raise ValueError(f"Unknown sweep keys {sorted(unknown)}; expected {sorted(known)}")
+    return SweepSpec(**{k: v if k in ("sims", "seed") else _axis(v) for k, v in raw.items()})
+
+def sweep_paths(buckets: BucketStore, term: TermSheet, spec: SweepSpec, seed, block: int = None):
+    """
+    Simulate one asset once and re-evaluate every (product, alpha, shift, neg)
+    on the same raw draws: hub residuals and raw basis are drawn per block, then
+    re-shifted and re-stressed as array ops; every WACC is one matrix product.
+    HUB products do not depend on alpha and are evaluated once per shift.
+    Returns {(product, alpha, shift, neg): (prices, npvs[sims, len(spec.wacc)])}.
+    """
+    products = list(spec.products)
+    markets = [mk for mk in ("RT", "DA") if any(p.startswith(mk) for p in products)]
+    basis_markets = [mk for mk in markets if f"{mk}_BUS" in products]
+    cells = _Cells(buckets, term, markets)
+    disc = discount_matrix(len(term.table), list(spec.wacc))
+    rng = np.random.default_rng(seed)
+    block = block or CFG.SIM_BLOCK_SIZE
+    acc = {}
+    for start in range(0, spec.sims, block):
+        n = min(block, spec.sims - start)
+        profiling.count("sims", n)
+        eff0, hub, basis = _draw_block(buckets, cells, markets, basis_markets, buckets.p_high, rng, n)
+        for product in products:
+            alphas = spec.basis_stress_alpha if product.endswith("BUS") else (None,)
+            for alpha in alphas:
+                for shift in spec.fwd_shift:
+                    node = _node_price(product, cells, hub, basis, alpha or 0.0, shift)
+                    for neg in spec.neg_rule:
+                        price, npv = _settle(node, eff0, neg, disc)
+                        acc.setdefault((product, alpha, shift, neg), []).append((price, npv))
+    return {k: (np.concatenate([p for p, _ in v]), np.concatenate([x for _, x in v])) for k, v in acc.items()}
+
+def run_sweep(spec: SweepSpec, stores: dict, terms: dict, assets=None):
+    """
+    Long-format results: one row per asset x product x negative_rule x p_level
+    x basis_stress_alpha x fwd_shift x wacc with the P-level price, mean price,
+    mean NPV and P-level NPV. Assets are seeded as in the CRN base run, so
+    the point (alpha=CFG, shift=0) reproduces its prices.
+    """
+    assets = list(assets or stores)
+    qs = [percentile_from_p_level(p) for p in spec.p_levels]
+    rows = []
+    for asset, ss in zip(assets, np.random.SeedSequence(spec.seed).spawn(len(assets))):
+        with profiling.stage("sweep", asset):
+            paths = sweep_paths(stores[asset], terms[asset], spec, ss)
+        market = CFG.ASSETS[asset]["market"]
+        for (product, alpha, shift, neg), (prices, npvs) in paths.items():
+            p_price = np.percentile(prices, qs)                 # (P,)
+            npv_p = np.percentile(npvs, qs, axis=0)             # (P, W)
+            npv_mean = npvs.mean(axis=0)
+            for a in ((alpha,) if alpha is not None else spec.basis_stress_alpha):
+                for i, p in enumerate(spec.p_levels):
+                    for j, w in enumerate(spec.wacc):
+                        rows.append((asset, market, product, neg, p, a, shift, w, p_price[i],
+                                     prices.mean(), npv_mean[j], npv_p[i, j]))
+    cols = ["asset", "market", "product", "negative_rule", "p_level", "basis_stress_alpha", "fwd_shift",
+            "wacc", "p_price", "mean_price", "npv_mean", "npv_p_level"]
+    return pd.DataFrame(rows, columns=cols).sort_values(cols[:8], ignore_index=True)
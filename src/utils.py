@@ -1,6 +1,13 @@
 import os
 import numpy as np
 
+_UMASK = os.umask(0)
+os.umask(_UMASK)                                  # read once at import: os.umask is process-wide, not thread-safe
+
+def umask_mode(mode: int = 0o666):
+    """`mode` as the umask would leave a newly created file (0o777 for dirs); mkstemp/mkdtemp create 0600/0700."""
+    return mode & ~_UMASK
+
 def ensure_dirs(*paths):
     for p in paths:
         os.makedirs(p, exist_ok=True)
@@ -1,48 +1,92 @@
+from statistics import NormalDist
 import numpy as np
-import pandas as pd
 from .config import CFG
+from .forecasting import TermSheet
+from .sketch import QuantileSketch
 from .utils import percentile_from_p_level, monthly_discount_rate, safe_div
 
-def p_level_price(sim_prices: np.ndarray, p_level: int):
+def p_level_price(sim_prices, p_level: int):
+    """sim_prices: array of sims or a QuantileSketch (streaming mode)."""
+    if isinstance(sim_prices, QuantileSketch):
+        return sim_prices.p_level(p_level)
     return float(np.percentile(sim_prices, percentile_from_p_level(p_level)))
 
-def compute_components(asset: str, product: str, gen_fc: pd.DataFrame, fw: pd.DataFrame,
-                       hist_basis_means: dict, p75_price: float, neg_p75_price: float = None):
-    # gen-weighted forward hub
-    gw_hub = 0.0
-    total_gen = gen_fc["expected_mwh"].sum()
-    for _, r in gen_fc.iterrows():
-        row_fw = fw[(fw["year"]==r["year"])&(fw["month"]==r["month"])]
-        if row_fw.empty: continue
-        gw_hub += (r["peak_mwh"]*row_fw["fw_peak"].iloc[0] + r["off_mwh"]*row_fw["fw_off"].iloc[0])
-    hub_component = safe_div(gw_hub, total_gen)
+def p_level_ci(sim_prices, p_level: int, level: float = None):
+    """
+    Distribution-free CI on the P-level price: order statistics at ranks
+    n*q -/+ z*sqrt(n*q*(1-q)) (normal approximation to the binomial).
+    Accepts sims or a QuantileSketch. Returns (low, high).
+    """
+    level = level or CFG.CI_LEVEL
+    n = sim_prices.count if isinstance(sim_prices, QuantileSketch) else len(sim_prices)
+    if n < 2: return (np.nan, np.nan)
+    q = percentile_from_p_level(p_level) / 100.0
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    half = z * np.sqrt(q * (1 - q) / n)
+    qs = 100 * np.clip([q - half, q + half], 0.0, 1.0)
+    lo, hi = (sim_prices.percentile(qs) if isinstance(sim_prices, QuantileSketch)
+              else np.percentile(sim_prices, qs))
+    return float(lo), float(hi)
+
+def compute_components(asset: str, product: str, term: TermSheet,
+                       p75_price: float, neg_p75_price: float = None):
+    mwh = term.pair("mwh")
+    total_gen = term.col("expected_mwh").sum()
+
+    # gen-weighted forward hub (months without a forward contribute 0)
+    hub_component = safe_div(float((mwh * term.pair("fw")).sum()), total_gen)
 
     # basis component (0 for hub products)
     if product.endswith("HUB"):
         basis_comp = 0.0
     else:
-        basis_comp = 0.0
-        for _, r in gen_fc.iterrows():
-            b_peak = hist_basis_means.get(((int(r["month"]), "Peak"), product[:2]), 0.0)   # 'RT'/'DA'
-            b_off  = hist_basis_means.get(((int(r["month"]), "Off-Peak"), product[:2]), 0.0)
-            basis_comp += r["peak_mwh"]*b_peak + r["off_mwh"]*b_off
-        basis_comp = safe_div(basis_comp, total_gen)
+        b = term.pair(f"{product[:2].lower()}_basis_mean")   # 'rt'/'da'
+        basis_comp = safe_div(float((mwh * b).sum()), total_gen)
 
     base = hub_component + basis_comp
     risk_adj = p75_price - base
     neg_adj = (neg_p75_price - p75_price) if neg_p75_price is not None else 0.0
     return hub_component, basis_comp, risk_adj, neg_adj, p75_price
 
-def dcf_monthly(mean_price: float, gen_fc: pd.DataFrame, wacc_annual: float):
-    r_m = (1 + wacc_annual) ** (1/12) - 1
-    pv = 0.0
-    for i, rr in enumerate(gen_fc.itertuples(index=False), start=1):
-        cf = mean_price * getattr(rr, "expected_mwh")
-        pv += cf / ((1 + r_m) ** i)
-    return float(pv)
-
-def summarize_npvs(merchant_p50_price: float, fixed_p75_price: float, gen_fc: pd.DataFrame):
-    m_npv = dcf_monthly(merchant_p50_price, gen_fc, CFG.WACC_ANNUAL)
-    f_npv = dcf_monthly(fixed_p75_price, gen_fc, CFG.WACC_ANNUAL)
+def discount_vector(n_months: int, wacc_annual: float):
+    """End-of-month discount factors (1+r_m)^-t for t = 1..n_months."""
+    return (1 + monthly_discount_rate(wacc_annual)) ** -np.arange(1, n_months + 1, dtype=float)
+
+def discount_matrix(n_months: int, waccs):
+    """(n_months, len(waccs)) discount factors; cash flows @ matrix = NPV per rate."""
+    return np.column_stack([discount_vector(n_months, w) for w in waccs]) if len(waccs) else np.zeros((n_months, 0))
+
+def dcf_monthly(mean_price: float, term: TermSheet, wacc_annual: float):
+    cf = mean_price * term.col("expected_mwh")
+    return float(cf @ discount_vector(len(cf), wacc_annual))
+
+def npv_paths(monthly_cf: np.ndarray, waccs):
+    """(paths, months) cash flows -> (paths, len(waccs)) NPVs in one matrix product."""
+    return monthly_cf @ discount_matrix(monthly_cf.shape[-1], waccs)
+
+def npv_distribution(npvs, p_levels=None, cvar_level: float = None):
+    """
+    Summary of a per-path NPV sample (array or QuantileSketch): mean, P-levels
+    (P75 -> 25th percentile, as for prices) and CVaR = mean of the worst
+    (100 - cvar_level)% of paths.
+    """
+    p_levels = p_levels or CFG.NPV_P_LEVELS
+    cvar_level = cvar_level or CFG.NPV_CVAR_LEVEL
+    tail_q = percentile_from_p_level(cvar_level)
+    if isinstance(npvs, QuantileSketch):
+        out = {"npv_mean": npvs.mean}
+        out.update({f"npv_p{p}": npvs.p_level(p) for p in p_levels})
+        out[f"npv_cvar{cvar_level}"] = npvs.tail_mean(tail_q)
+        return out
+    npvs = np.asarray(npvs, dtype=float)
+    out = {"npv_mean": float(npvs.mean())}
+    out.update({f"npv_p{p}": float(np.percentile(npvs, percentile_from_p_level(p))) for p in p_levels})
+    var = np.percentile(npvs, tail_q)
+    out[f"npv_cvar{cvar_level}"] = float(npvs[npvs <= var].mean())
+    return out
+
+def summarize_npvs(merchant_p50_price: float, fixed_p75_price: float, term: TermSheet):
+    m_npv = dcf_monthly(merchant_p50_price, term, CFG.WACC_ANNUAL)
+    f_npv = dcf_monthly(fixed_p75_price, term, CFG.WACC_ANNUAL)
     delta = safe_div(f_npv - m_npv, m_npv) * 100.0 if m_npv else 0.0
     return m_npv, f_npv, delta
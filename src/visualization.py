@@ -1,14 +1,65 @@
+import json
 import os
-import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from .config import CFG
+from .sketch import QuantileSketch
 
-def plot_distribution(sim_prices, p75, out_path, title):
+def _pyplot():
+    """matplotlib.pyplot on the non-GUI Agg backend, imported on first use."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def histogram(sim_prices, bins: int = 50):
+    """(counts, edges) of a sim array or a QuantileSketch (rebinned)."""
+    if isinstance(sim_prices, QuantileSketch):
+        return sim_prices.histogram(bins=bins)
+    return np.histogram(sim_prices, bins=bins)
+
+def figure_spec(sim_prices, p75, out_path, title, bins: int = 50):
+    """Everything needed to draw one distribution figure, detached from the sims."""
+    counts, edges = histogram(sim_prices, bins)
+    return {"counts": np.asarray(counts, float).tolist(), "edges": np.asarray(edges, float).tolist(),
+            "p75": float(p75), "out_path": out_path, "title": title}
+
+def render_figure(spec: dict, dpi: int = None):
+    plt = _pyplot()
+    edges = np.asarray(spec["edges"])
     plt.figure(figsize=(6,4))
-    plt.hist(sim_prices, bins=50)
-    plt.axvline(p75, linestyle="--")
-    plt.title(title)
+    plt.hist(edges[:-1], bins=edges, weights=spec["counts"])
+    plt.axvline(spec["p75"], linestyle="--")
+    plt.title(spec["title"])
     plt.xlabel("$ / MWh"); plt.ylabel("Frequency")
-    os.makedirs(CFG.OUT_FIGS, exist_ok=True)
+    os.makedirs(os.path.dirname(spec["out_path"]) or ".", exist_ok=True)
     plt.tight_layout()
-    plt.savefig(out_path, dpi=160)
+    plt.savefig(spec["out_path"], dpi=dpi or CFG.PLOT_DPI)
     plt.close()
+    return spec["out_path"]
+
+def render_figures(specs, workers: int = None):
+    """Render figure specs serially (workers<=1) or on a process pool; returns the written paths."""
+    workers = min(workers or CFG.PLOT_WORKERS or os.cpu_count() or 1, len(specs))
+    if workers <= 1:
+        return [render_figure(s) for s in specs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(render_figure, specs))
+
+def save_figure_specs(specs, path: str = None):
+    path = path or os.path.join(CFG.OUT_FIGS, "histograms.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(specs, f)
+    return path
+
+def load_figure_specs(path: str = None):
+    path = path or os.path.join(CFG.OUT_FIGS, "histograms.json")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found; run main.py (with or without --no-plots) first")
+    with open(path) as f:
+        return json.load(f)
+
+def plot_distribution(sim_prices, p75, out_path, title):
+    """sim_prices: array of sims or a QuantileSketch (plotted from its rebinned histogram)."""
+    render_figure(figure_spec(sim_prices, p75, out_path, title))
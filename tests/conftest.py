@@ -0,0 +1,12 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope="session")
+def inputs():
+    """(stores, terms) for the bundled assets, built without reading or writing any cache."""
+    import main
+    _, stores, _, terms, _ = main._prepare(use_cache=False, memo=False)
+    return stores, terms
@@ -0,0 +1,22 @@
+"""End-to-end adaptive (--tolerance) run: assets stop at different sim counts."""
+import pandas as pd
+import pytest
+
+from src.config import CFG
+
+TOLERANCE = 1.0
+
+@pytest.mark.parametrize("crn", [True, False])
+def test_adaptive_run(tmp_path, monkeypatch, crn):
+    import main
+    for field in ("PROC_DIR", "MEMO_DIR", "OUT_RESULTS", "OUT_FIGS", "RUNS_DIR"):
+        monkeypatch.setattr(CFG, field, f"{tmp_path}/{field.lower()}/")
+    main.main(p_level=75, sims=4000, neg_rule=True, tolerance=TOLERANCE, crn=crn, use_cache=False,
+              memo=False, plots=False, record=False)
+
+    prices = pd.read_csv(tmp_path / "out_results" / "prices_summary.csv")
+    assert prices["n_sims"].nunique() > 1                      # the case that used to break the portfolio sum
+    assert (prices["p_ci_high"] - prices["p_ci_low"] <= TOLERANCE + 1e-9)[prices["n_sims"] < 4000].all()
+    dist = pd.read_csv(tmp_path / "out_results" / "npv_distribution.csv")
+    port = dist[dist["asset"] == "PORTFOLIO"]
+    assert len(port) == len(CFG.PRODUCTS) * 2 and port["npv_p50"].notna().all()
@@ -0,0 +1,36 @@
+"""The vectorized engine against the scalar reference: P50 and P-level within bootstrap error."""
+import numpy as np
+import pytest
+
+from src.config import CFG
+from src.monte_carlo import simulate_merchant_price_per_mwh
+from src.utils import percentile_from_p_level
+
+N_LOOP, N_VEC, N_BOOT, TOL_SE = 200, 10_000, 500, 5.0
+SEED = CFG.RANDOM_SEED
+
+def _quantile_gaps(buckets, term, product, negative_rule, seed):
+    """
+    {q: (vectorized - loop, bootstrap SE)} for q = P50 and the CFG.P_LEVEL
+    percentile. Quantiles, not means: the heavy-tailed basis makes the mean of
+    a few hundred loop sims unreliable.
+    """
+    kw = dict(buckets=buckets, term=term, product=product, p_high=buckets.p_high,
+              negative_rule=negative_rule, seed=seed)
+    ref = simulate_merchant_price_per_mwh(n_sims=N_LOOP, engine="loop", **kw)
+    vec = simulate_merchant_price_per_mwh(n_sims=N_VEC, engine="vectorized", **kw)
+    rng = np.random.default_rng(seed)
+    out = {}
+    for q in (50, percentile_from_p_level(CFG.P_LEVEL)):
+        se = [np.std(np.percentile(a[rng.integers(0, len(a), size=(N_BOOT, len(a)))], q, axis=1))
+              for a in (ref, vec)]
+        out[q] = (float(np.percentile(vec, q) - np.percentile(ref, q)), float(np.hypot(*se)))
+    return out
+
+@pytest.mark.parametrize("negative_rule", [False, True])
+@pytest.mark.parametrize("product", CFG.PRODUCTS)
+@pytest.mark.parametrize("asset", list(CFG.ASSETS))
+def test_engines_agree(inputs, asset, product, negative_rule):
+    stores, terms = inputs
+    for q, (gap, se) in _quantile_gaps(stores[asset], terms[asset], product, negative_rule, SEED).items():
+        assert abs(gap) <= TOL_SE * max(se, 1e-9), f"{q:g}th percentile off by {gap:.3f} ({gap / se:.1f} SE)"
@@ -0,0 +1,28 @@
+"""Hourly engine chunking: adaptive runs keep HOURLY_BLOCK_SIMS blocks and check convergence per SIM_BATCH."""
+import numpy as np
+import pytest
+
+from src import monte_carlo
+from src.config import CFG
+
+@pytest.mark.parametrize("tolerance", [0.0, 1e9])
+def test_hourly_block_size_ignores_tolerance(inputs, monkeypatch, tolerance):
+    stores, terms = inputs
+    asset = next(iter(stores))
+    blocks = []
+    def fake_iter_hourly(hist, term, products, neg_rules, rng, n_sims, block, disc=None, **_):
+        for start in range(0, n_sims, block):
+            n = min(block, n_sims - start)
+            blocks.append(n)
+            yield {(p, neg): rng.normal(size=n) for p in products for neg in neg_rules}, {}
+    monkeypatch.setattr(monte_carlo, "_iter_hourly", fake_iter_hourly)
+
+    n_sims = 3 * CFG.SIM_BATCH
+    prices, _ = monte_carlo.simulate_joint_paths(stores[asset], terms[asset], ["RT_BUS"], 0.5, [False], 7,
+                                                 n_sims, tolerance=tolerance, hourly=object())
+    assert max(blocks) == CFG.HOURLY_BLOCK_SIMS
+    n = len(prices[("RT_BUS", False)])
+    if tolerance:                                   # converges at the first check, after SIM_BATCH sims
+        assert CFG.SIM_BATCH <= n < CFG.SIM_BATCH + CFG.HOURLY_BLOCK_SIMS
+    else:
+        assert n == n_sims